@@ -18,22 +18,54 @@ import os
 import random
 import struct
 import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple, Any
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; without it payloads are parsed whole
+    ijson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; only --format binary needs it
+    msgpack = None
 
 from osm_shape_mapping import (
     CoordinateTransformer,
-    get_terrain_shape,
+    get_terrain_shape_array,
     get_object_shapes,
+    get_object_shape_arrays,
     get_npc_for_building,
     get_furniture_for_room,
     get_furniture_shapes,
     get_npc_with_dialogue,
-    TERRAIN_SHAPES,
     OBJECT_SHAPES,
-    OSM_HIGHWAY_TO_TERRAIN,
+    SHAPE_TO_TERRAIN,
+    OBJECT_SHAPE_ARRAYS,
+    TERRAIN_SHAPE_ARRAYS,
     NPC_PROFESSIONS,
+    NPC_TYPE_QUALITY,
+    HIGHWAY_TAG_ID,
+    HIGHWAY_TERRAIN_LUT,
+    sample_terrain,
+    terrain_shape_array,
+)
+from rasterize import (
+    HAVE_NUMBA, LINE, POLYGON, RECT, bresenham_points, burn_bands, mark_thick_line, pack_ireg,
 )
 
 
@@ -41,7 +73,11 @@ from osm_shape_mapping import (
 # DATA STRUCTURES
 # =============================================================================
 
-@dataclass
+# Byte layout of one IREG record (see UltimaObject.to_ireg_bytes)
+_IREG = struct.Struct("<10B")
+
+
+@dataclass(slots=True)
 class UltimaObject:
     """Represents an object to be placed in the Ultima map."""
     shape: int
@@ -52,8 +88,148 @@ class UltimaObject:
     quality: int = 0
     flags: int = 0
 
+    def to_ireg_bytes(self) -> bytes:
+        """Convert to IREG format bytes."""
+        # Simplified IREG format (10 bytes). Each position byte is the chunk
+        # within the superchunk in the high nibble and the tile within the
+        # chunk in the low nibble, which is just the low byte of the tile.
+        return _IREG.pack(
+            10,  # length
+            self.x & 0xff,
+            self.y & 0xff,
+            self.shape & 0xff,
+            ((self.shape >> 8) & 3) | (self.frame << 2),
+            self.lift & 0x0f,  # nibble swap
+            self.quality & 0xff,
+            0,  # temporary flag
+            0,  # filler
+            0,  # filler
+        )
 
-@dataclass
+
+# Packed record layout for objects stored in an ObjectBuffer (10 bytes).
+# Tile coordinates are u2, so a map side is at most MAX_MAP_CHUNKS chunks
+# (65536 tiles); main rejects larger --size values.
+OBJECT_DTYPE = np.dtype([
+    ("shape", "u2"),
+    ("frame", "u1"),
+    ("x", "u2"),  # tile x
+    ("y", "u2"),  # tile y
+    ("lift", "u1"),
+    ("quality", "u1"),
+    ("flags", "u1"),
+])
+MAX_MAP_CHUNKS = (np.iinfo(OBJECT_DTYPE["x"]).max + 1) // 16
+
+IREG_RECORD_SIZE = 10
+
+
+def encode_ireg(records: np.ndarray) -> np.ndarray:
+    """Encode an array of OBJECT_DTYPE records as an (N, 10) uint8 IREG array.
+
+    Row i holds the same bytes as records[i]'s UltimaObject.to_ireg_bytes().
+    """
+    # The numba kernel packs in one pass; the NumPy path takes one per byte
+    if HAVE_NUMBA:
+        buf = np.empty((len(records), IREG_RECORD_SIZE), dtype=np.uint8)
+        pack_ireg(records["shape"], records["frame"], records["x"], records["y"],
+                  records["lift"], records["quality"], buf)
+        return buf
+
+    x = records["x"].astype(np.int32)
+    y = records["y"].astype(np.int32)
+    shape = records["shape"].astype(np.int32)
+    frame = records["frame"].astype(np.int32)
+
+    buf = np.zeros((len(records), IREG_RECORD_SIZE), dtype=np.uint8)
+    buf[:, 0] = IREG_RECORD_SIZE  # length
+    buf[:, 1] = x & 0xff  # (chunk % 16) << 4 | local tile
+    buf[:, 2] = y & 0xff
+    buf[:, 3] = shape & 0xff
+    buf[:, 4] = ((shape >> 8) & 3) | (frame << 2)
+    buf[:, 5] = records["lift"] & 0x0f
+    buf[:, 6] = records["quality"]
+    # bytes 7-9: temporary flag and filler, left as zero
+
+    return buf
+
+
+def dump_ireg(records: np.ndarray) -> bytes:
+    """Encode an array of OBJECT_DTYPE records as IREG bytes in one vectorized pass."""
+    return encode_ireg(records).tobytes()
+
+
+def object_records(shapes, xs, ys, lift: int = 0) -> np.ndarray:
+    """Build an OBJECT_DTYPE array from parallel shape, x and y arrays."""
+    records = np.zeros(len(shapes), dtype=OBJECT_DTYPE)
+    records["shape"] = shapes
+    records["x"] = xs
+    records["y"] = ys
+    records["lift"] = lift
+    return records
+
+
+# Shared read-only storage for buffers that have not had anything added yet
+_NO_RECORDS = np.zeros(0, dtype=OBJECT_DTYPE)
+_NO_RECORDS.flags.writeable = False
+
+
+class ObjectBuffer:
+    """Growable structured array of objects (one OBJECT_DTYPE record each).
+
+    Iterating yields UltimaObject instances rebuilt from the records. Empty
+    buffers share one read-only array and only allocate on the first add,
+    so the many chunks that never get an object cost next to nothing.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self._data = np.zeros(capacity, dtype=OBJECT_DTYPE) if capacity else _NO_RECORDS
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for record in self.records.tolist():
+            yield UltimaObject(*record)
+
+    @property
+    def records(self) -> np.ndarray:
+        """View of the filled part of the buffer."""
+        return self._data[:self._count]
+
+    def append(self, obj: UltimaObject):
+        """Append an object, doubling the buffer when it is full."""
+        if self._count == len(self._data):
+            grown = np.zeros(max(len(self._data) * 2, 16), dtype=OBJECT_DTYPE)
+            grown[:self._count] = self._data
+            self._data = grown
+        self._data[self._count] = (obj.shape, obj.frame, obj.x, obj.y,
+                                   obj.lift, obj.quality, obj.flags)
+        self._count += 1
+
+    def extend(self, records: np.ndarray):
+        """Append an array of OBJECT_DTYPE records, growing the buffer to fit."""
+        if not len(records):
+            return
+        needed = self._count + len(records)
+        if needed > len(self._data):
+            grown = np.zeros(max(needed, len(self._data) * 2, 16), dtype=OBJECT_DTYPE)
+            grown[:self._count] = self._data[:self._count]
+            self._data = grown
+        self._data[self._count:needed] = records
+        self._count = needed
+
+    def to_ireg_bytes(self) -> bytes:
+        """Encode all objects as IREG records."""
+        return dump_ireg(self.records)
+
+    def write_ireg(self, f):
+        """Write all objects as IREG records straight to an open binary file."""
+        encode_ireg(self.records).tofile(f)
+
+
+@dataclass(slots=True)
 class NPCProfile:
     """NPC profile for AI system integration."""
     id: str
@@ -77,56 +253,56 @@ class NPCProfile:
 
     # Relationships (npc_id -> initial relationship value)
     relationships: Dict[str, float] = field(default_factory=dict)
-    
-    def to_ireg_bytes(self) -> bytes:
-        """Convert to IREG format bytes."""
-        # Simplified IREG format (10 bytes)
-        chunk_x = self.x // 16
-        chunk_y = self.y // 16
-        local_x = self.x % 16
-        local_y = self.y % 16
-        
-        buf = bytearray(10)
-        buf[0] = 10  # length
-        buf[1] = ((chunk_x % 16) << 4) | local_x
-        buf[2] = ((chunk_y % 16) << 4) | local_y
-        buf[3] = self.shape & 0xff
-        buf[4] = ((self.shape >> 8) & 3) | (self.frame << 2)
-        buf[5] = (self.lift & 0x0f)  # nibble swap
-        buf[6] = self.quality & 0xff
-        buf[7] = 0  # temporary flag
-        buf[8] = 0  # filler
-        buf[9] = 0  # filler
-        
-        return bytes(buf)
 
 
-@dataclass
+@dataclass(slots=True)
 class UltimaChunk:
-    """Represents a 16x16 tile chunk."""
-    terrain: List[List[int]] = field(default_factory=lambda: [[4] * 16 for _ in range(16)])  # default grass
-    objects: List[UltimaObject] = field(default_factory=list)
+    """Represents a 16x16 tile chunk's objects (terrain lives in UltimaMap.terrain)."""
+    objects: ObjectBuffer = field(default_factory=ObjectBuffer)
 
 
 @dataclass
 class UltimaMap:
-    """Represents the full Ultima map."""
+    """Represents the full Ultima map.
+
+    Terrain is stored as one dense uint16 array indexed [tile_y, tile_x];
+    chunks only hold the object buffers and are all created up front.
+    Roofs are a second layer of the same shape (0 = no roof) and become
+    lift-4 objects only when records are read out for export.
+    """
     width_chunks: int = 16
     height_chunks: int = 16
     chunks: Dict[Tuple[int, int], UltimaChunk] = field(default_factory=dict)
-    
+    terrain: np.ndarray = field(init=False, repr=False)
+    roof: np.ndarray = field(init=False, repr=False)
+
+    ROOF_LIFT = 4
+
+    def __post_init__(self):
+        self.terrain = np.full((self.height_chunks * 16, self.width_chunks * 16), 4,
+                               dtype=np.uint16)  # default grass
+        # np.zeros gets calloc'd pages, so roof-free areas never touch memory
+        self.roof = np.zeros(self.terrain.shape, dtype=np.uint16)
+        chunks = {(cx, cy): UltimaChunk()
+                  for cy in range(self.height_chunks) for cx in range(self.width_chunks)}
+        chunks.update(self.chunks)
+        self.chunks = chunks
+
     def get_chunk(self, cx: int, cy: int) -> UltimaChunk:
-        """Get or create a chunk at the given coordinates."""
-        if (cx, cy) not in self.chunks:
-            self.chunks[(cx, cy)] = UltimaChunk()
+        """Get the chunk at the given coordinates."""
         return self.chunks[(cx, cy)]
-    
+
+    def chunk_terrain(self, cx: int, cy: int) -> np.ndarray:
+        """Return a 16x16 view of the terrain for a chunk."""
+        return self.terrain[cy * 16:(cy + 1) * 16, cx * 16:(cx + 1) * 16]
+
     def set_terrain(self, tile_x: int, tile_y: int, shape: int):
         """Set terrain at a specific tile."""
-        cx, cy = tile_x // 16, tile_y // 16
-        lx, ly = tile_x % 16, tile_y % 16
-        chunk = self.get_chunk(cx, cy)
-        chunk.terrain[ly][lx] = shape
+        self.terrain[tile_y, tile_x] = shape
+
+    def set_roof(self, tile_x: int, tile_y: int, shape: int):
+        """Set the roof shape at a specific tile (0 removes it)."""
+        self.roof[tile_y, tile_x] = shape
     
     def add_object(self, obj: UltimaObject):
         """Add an object to the appropriate chunk."""
@@ -134,25 +310,160 @@ class UltimaMap:
         chunk = self.get_chunk(cx, cy)
         chunk.objects.append(obj)
 
+    def chunk_records(self, cx: int, cy: int) -> np.ndarray:
+        """A chunk's objects followed by its roof tiles, as OBJECT_DTYPE records."""
+        roof = self.roof[cy * 16:(cy + 1) * 16, cx * 16:(cx + 1) * 16]
+        ly, lx = np.nonzero(roof)
+        roofs = object_records(roof[ly, lx], cx * 16 + lx, cy * 16 + ly, lift=self.ROOF_LIFT)
+        return np.concatenate([self.chunks[(cx, cy)].objects.records, roofs])
+
+    def all_records(self) -> np.ndarray:
+        """All objects, roofs included, as one OBJECT_DTYPE array in chunk order."""
+        return np.concatenate([self.chunk_records(cx, cy) for cx, cy in self.chunks])
+
+    def add_records(self, records: np.ndarray):
+        """Add an array of OBJECT_DTYPE records, one bulk append per chunk."""
+        keys = (records["y"].astype(np.intp) // 16) * self.width_chunks + records["x"] // 16
+        order = np.argsort(keys, kind="stable")  # keep insertion order within a chunk
+        records = records[order]
+        for group in np.split(records, np.flatnonzero(np.diff(keys[order])) + 1):
+            if len(group):
+                self.get_chunk(int(group["x"][0]) // 16, int(group["y"][0]) // 16).objects.extend(group)
+
+
+def hash64(text: str) -> int:
+    """Stable 64-bit hash of a string (unlike hash(), not salted per process)."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
 
 # =============================================================================
 # OSM DATA FETCHING
 # =============================================================================
 
+# Approximate degrees per meter; the longitude scale depends on latitude
+LAT_DEG_PER_M = 1 / 111320
+
+
+@lru_cache(maxsize=1024)
+def _lon_deg_per_m(lat: float) -> float:
+    """Degrees of longitude per meter at lat (callers round lat to 1e-3 degrees)."""
+    return 1 / (111320 * math.cos(math.radians(lat)))
+
+
+def _json_loads(data: bytes):
+    """Parse a JSON payload, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize obj to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+# Buffer size for the JSON/GeoJSON/MessagePack writers, so large outputs
+# go out in a few big write() calls rather than many 8 KB ones
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _dump_json(obj, path: str, pretty: bool = False):
+    """Write obj to path as JSON, indented if pretty, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(orjson.dumps(obj, option=option))
+    else:
+        with open(path, "w", buffering=WRITE_BUFFER_SIZE) as f:
+            if pretty:
+                json.dump(obj, f, indent=2)
+            else:
+                json.dump(obj, f, separators=(",", ":"))
+
+
+def _dump_msgpack(obj, path: str):
+    """Write obj to path as MessagePack (needs the optional msgpack package)."""
+    with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        msgpack.pack(obj, f, use_bin_type=True)
+
+
+def _dump(obj, path: str, pretty: bool = False):
+    """Write obj to path as MessagePack for .msgpack paths, JSON otherwise."""
+    if path.endswith(".msgpack"):
+        _dump_msgpack(obj, path)
+    else:
+        _dump_json(obj, path, pretty)
+
+
 class OSMFetcher:
     """Fetches data from OpenStreetMap via Overpass API."""
     
     OVERPASS_URL = "https://overpass.kumi.systems/api/interpreter"
     NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+    GEOCODE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "osm2ultima")
+    
+    # Nominatim usage policy: at most one request per second
+    NOMINATIM_MIN_INTERVAL = 1.0
+    _last_nominatim_call = 0.0
+    
+    # Larger bboxes are split into tiles of at most this many degrees, fetched
+    # two at a time (Overpass allows two concurrent slots per client)
+    OVERPASS_TILE_DEG = 0.02
+    OVERPASS_MAX_CONCURRENT = 2
     
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
-            "User-Agent": "OSM2Ultima/1.0 (https://github.com/c9py/ultimain)"
+            "User-Agent": "OSM2Ultima/1.0 (https://github.com/c9py/ultimain)",
+            "Accept-Encoding": "gzip, deflate",
         })
+        
+        # Keep connections alive across Nominatim/Overpass calls and back off
+        # when Overpass rate-limits (429) or times out at the gateway (504).
+        # Overpass queries are idempotent, so POST is safe to retry.
+        retry = Retry(total=3, backoff_factor=2, status_forcelist=[429, 504],
+                      allowed_methods=frozenset({"GET", "POST"}))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def geocode_place(self, place_name: str) -> Tuple[float, float]:
-        """Get coordinates for a place name."""
+        """Get coordinates for a place name, using the on-disk cache when possible."""
+        key = hashlib.sha1(place_name.lower().encode()).hexdigest()
+        cache_path = os.path.join(self.GEOCODE_CACHE_DIR, f"{key}.json")
+        
+        try:
+            with open(cache_path) as f:
+                lon, lat = json.load(f)
+            return float(lon), float(lat)
+        except (OSError, ValueError):
+            pass
+        
+        lon, lat = self._geocode_remote(place_name)
+        
+        # Best effort: write atomically so concurrent runs never see a partial file
+        try:
+            os.makedirs(self.GEOCODE_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump([lon, lat], f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+        
+        return lon, lat
+    
+    def _geocode_remote(self, place_name: str) -> Tuple[float, float]:
+        """Query Nominatim for a place name."""
+        wait = OSMFetcher._last_nominatim_call + self.NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        OSMFetcher._last_nominatim_call = time.monotonic()
+        
         params = {
             "q": place_name,
             "format": "json",
@@ -160,7 +471,7 @@ class OSMFetcher:
         }
         response = self.session.get(self.NOMINATIM_URL, params=params)
         response.raise_for_status()
-        results = response.json()
+        results = _json_loads(response.content)
         
         if not results:
             raise ValueError(f"Could not find place: {place_name}")
@@ -169,12 +480,8 @@ class OSMFetcher:
     
     def bbox_from_center(self, lon: float, lat: float, radius_m: float) -> Tuple[float, float, float, float]:
         """Calculate bounding box from center point and radius in meters."""
-        # Approximate degrees per meter at this latitude
-        lat_deg_per_m = 1 / 111320
-        lon_deg_per_m = 1 / (111320 * math.cos(math.radians(lat)))
-        
-        delta_lat = radius_m * lat_deg_per_m
-        delta_lon = radius_m * lon_deg_per_m
+        delta_lat = radius_m * LAT_DEG_PER_M
+        delta_lon = radius_m * _lon_deg_per_m(round(lat, 3))
         
         return (
             lon - delta_lon,  # min_lon
@@ -183,15 +490,12 @@ class OSMFetcher:
             lat + delta_lat   # max_lat
         )
     
-    def fetch_osm_data(self, bbox: Tuple[float, float, float, float]) -> dict:
-        """
-        Fetch OSM data for a bounding box.
-        Returns GeoJSON-like structure.
-        """
+    def _build_query(self, bbox: Tuple[float, float, float, float]) -> str:
+        """Build the Overpass query for all relevant features in a bounding box."""
         min_lon, min_lat, max_lon, max_lat = bbox
         
         # Overpass query for all relevant features
-        query = f"""
+        return f"""
         [out:json][timeout:60];
         (
           // Buildings
@@ -227,12 +531,142 @@ class OSMFetcher:
         >;
         out skel qt;
         """
+    
+    def fetch_osm_data(self, bbox: Tuple[float, float, float, float]) -> dict:
+        """
+        Fetch OSM data for a bounding box.
+        Returns GeoJSON-like structure.
+        """
+        query = self._build_query(bbox)
         
         print(f"Fetching OSM data for bbox: {bbox}")
         response = self.session.post(self.OVERPASS_URL, data={"data": query})
         response.raise_for_status()
         
-        return response.json()
+        return _json_loads(response.content)
+    
+    def iter_osm_elements(self, bbox: Tuple[float, float, float, float]) -> Iterator[dict]:
+        """
+        Fetch OSM data for a bounding box, yielding elements as they are parsed.
+        Streams the response through ijson when available so the full payload
+        is never materialized.
+        """
+        if ijson is None:
+            yield from self.fetch_osm_data(bbox).get("elements", [])
+            return
+        
+        query = self._build_query(bbox)
+        
+        print(f"Fetching OSM data for bbox: {bbox}")
+        with self.session.post(self.OVERPASS_URL, data={"data": query}, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # let urllib3 undo gzip
+            yield from ijson.items(response.raw, "elements.item", use_float=True)
+    
+    def fetch_osm_tiled(self, bbox: Tuple[float, float, float, float],
+                        tile_deg: Optional[float] = None) -> dict:
+        """
+        Fetch OSM data for a large bounding box as a grid of smaller queries.
+        Elements shared between tiles (ways crossing a tile edge and their
+        nodes) are kept once.
+        """
+        tile_deg = tile_deg or self.OVERPASS_TILE_DEG
+        min_lon, min_lat, max_lon, max_lat = bbox
+        nx = max(1, math.ceil((max_lon - min_lon) / tile_deg))
+        ny = max(1, math.ceil((max_lat - min_lat) / tile_deg))
+        step_lon = (max_lon - min_lon) / nx
+        step_lat = (max_lat - min_lat) / ny
+        
+        tiles = [
+            (min_lon + i * step_lon, min_lat + j * step_lat,
+             min_lon + (i + 1) * step_lon, min_lat + (j + 1) * step_lat)
+            for j in range(ny) for i in range(nx)
+        ]
+        
+        print(f"Splitting bbox into {nx}x{ny} Overpass tiles")
+        elements = []
+        index = {}
+        with ThreadPoolExecutor(max_workers=self.OVERPASS_MAX_CONCURRENT) as executor:
+            for data in executor.map(self.fetch_osm_data, tiles):
+                for element in data.get("elements", []):
+                    key = (element["type"], element["id"])
+                    if key not in index:
+                        index[key] = len(elements)
+                        elements.append(element)
+                    elif "tags" in element and "tags" not in elements[index[key]]:
+                        # Nodes fetched only as way members carry no tags;
+                        # keep the copy that does
+                        elements[index[key]] = element
+        
+        return {"elements": elements}
+
+
+# NPC types that live in each building type
+_NPC_BY_BUILDING = {
+    "house": ("townsman", "townswoman"),
+    "residential": ("townsman", "townswoman", "child"),
+    "shop": ("shopkeeper",),
+    "retail": ("shopkeeper",),
+    "commercial": ("shopkeeper", "townsman"),
+    "church": ("sage",),
+    "castle": ("guard", "noble_male", "noble_female"),
+    "fort": ("guard", "fighter"),
+    "government": ("guard", "noble_male"),
+    "hospital": ("sage",),
+    "school": ("sage",),
+    "tavern": ("entertainer", "townsman", "townswoman"),
+    "farm": ("farmer",),
+    "barn": ("farmer",),
+    "industrial": ("blacksmith", "townsman"),
+    "warehouse": ("townsman",),
+}
+_NPC_DEFAULT_TYPES = ("townsman",)
+
+# Simple procedural names
+_FIRST_NAMES_M = ("Gareth", "Aldric", "Cedric", "Edmund", "Roland",
+                  "Geoffrey", "Wilfred", "Oswald", "Reginald", "Bernard")
+_FIRST_NAMES_F = ("Elara", "Beatrice", "Gwyneth", "Isolde", "Rowena",
+                  "Millicent", "Cordelia", "Elowen", "Rosalind", "Lysandra")
+_FEMALE_NPC_TYPES = frozenset(("townswoman", "noble_female"))
+
+# Personality traits (OCEAN) based on profession
+_NPC_PERSONALITY = {
+    "townsman": {"o": 0.4, "c": 0.5, "e": 0.5, "a": 0.6, "n": 0.4},
+    "townswoman": {"o": 0.5, "c": 0.6, "e": 0.5, "a": 0.7, "n": 0.4},
+    "child": {"o": 0.8, "c": 0.3, "e": 0.8, "a": 0.6, "n": 0.5},
+    "guard": {"o": 0.3, "c": 0.8, "e": 0.4, "a": 0.4, "n": 0.3},
+    "shopkeeper": {"o": 0.5, "c": 0.7, "e": 0.7, "a": 0.6, "n": 0.3},
+    "blacksmith": {"o": 0.4, "c": 0.8, "e": 0.4, "a": 0.5, "n": 0.3},
+    "farmer": {"o": 0.3, "c": 0.7, "e": 0.4, "a": 0.6, "n": 0.4},
+    "mage": {"o": 0.9, "c": 0.6, "e": 0.3, "a": 0.4, "n": 0.5},
+    "sage": {"o": 0.8, "c": 0.7, "e": 0.3, "a": 0.6, "n": 0.3},
+    "noble_male": {"o": 0.5, "c": 0.6, "e": 0.6, "a": 0.3, "n": 0.4},
+    "noble_female": {"o": 0.6, "c": 0.6, "e": 0.5, "a": 0.4, "n": 0.5},
+    "entertainer": {"o": 0.8, "c": 0.4, "e": 0.9, "a": 0.7, "n": 0.5},
+    "beggar": {"o": 0.4, "c": 0.3, "e": 0.4, "a": 0.5, "n": 0.7},
+    "fighter": {"o": 0.4, "c": 0.6, "e": 0.5, "a": 0.3, "n": 0.4},
+    "ranger": {"o": 0.6, "c": 0.6, "e": 0.3, "a": 0.5, "n": 0.3},
+}
+_NPC_DEFAULT_PERSONALITY = {"o": 0.5, "c": 0.5, "e": 0.5, "a": 0.5, "n": 0.5}
+
+# Knowledge domains based on profession
+_NPC_KNOWLEDGE = {
+    "townsman": ("local_gossip", "town_history"),
+    "townswoman": ("local_gossip", "town_history", "cooking"),
+    "child": ("games", "local_secrets"),
+    "guard": ("combat", "law", "town_security"),
+    "shopkeeper": ("commerce", "goods", "local_economy"),
+    "blacksmith": ("smithing", "weapons", "armor", "metallurgy"),
+    "farmer": ("agriculture", "weather", "animals"),
+    "mage": ("magic", "arcana", "history", "alchemy"),
+    "sage": ("history", "lore", "religion", "medicine"),
+    "noble_male": ("politics", "heraldry", "etiquette"),
+    "noble_female": ("politics", "heraldry", "etiquette", "fashion"),
+    "entertainer": ("music", "stories", "gossip", "performance"),
+    "fighter": ("combat", "weapons", "tactics"),
+    "ranger": ("nature", "tracking", "survival", "beasts"),
+}
+_NPC_DEFAULT_KNOWLEDGE = ("general",)
 
 
 # =============================================================================
@@ -260,23 +694,32 @@ class MapGenerator:
         "steps": 1,
     }
 
-    def __init__(self, bbox: Tuple[float, float, float, float], map_size: Tuple[int, int] = (16, 16)):
+    # road_grid cell values besides 1 + HIGHWAY_TAG_ID[tag] (0 = no road)
+    ROAD_OTHER = 254  # highway tag without a terrain mapping
+    ROAD_INTERSECTION = 255
+
+    # Way kinds by priority: a way is handled as the first of these tags it has
+    WAY_KINDS = ("highway", "building", "landuse", "natural", "waterway", "barrier")
+
+    def __init__(self, bbox: Tuple[float, float, float, float], map_size: Tuple[int, int] = (16, 16),
+                 workers: int = 1):
         """
         Initialize generator.
 
         bbox: (min_lon, min_lat, max_lon, max_lat)
         map_size: (width_chunks, height_chunks)
+        workers: processes used to rasterize terrain (1 = in-process)
         """
         self.bbox = bbox
         self.map_size = map_size
-        self.transformer = CoordinateTransformer(bbox, map_size)
+        self.transformer = CoordinateTransformer.get(bbox, map_size)
         self.ultima_map = UltimaMap(width_chunks=map_size[0], height_chunks=map_size[1])
 
         # Node cache for resolving way coordinates
         self.nodes: Dict[int, Tuple[float, float]] = {}
 
         # Track road segments for intersection detection
-        self.road_tiles: Dict[Tuple[int, int], str] = {}  # tile -> highway type
+        self.road_grid = np.zeros_like(self.ultima_map.terrain, dtype=np.uint8)  # [tile_y, tile_x]
 
         # Track bridges for proper rendering
         self.bridges: List[Dict] = []
@@ -285,6 +728,19 @@ class MapGenerator:
         self.npc_profiles: List[NPCProfile] = []
         self.npc_counter = 0
 
+        # Terrain writes are queued as burn ops and rasterized in one go
+        self.terrain_ops: List[tuple] = []
+        self.workers = workers
+
+        # Derive the kernel RNG seed from `random` so --seed covers both
+        self.raster_seed = random.getrandbits(32)
+
+        # Base seed for the per-NPC generators (see _rng_for)
+        self.npc_seed = random.getrandbits(64)
+
+        # Generator for bulk shape draws made outside the kernels
+        self.rng = np.random.default_rng(random.getrandbits(64))
+
         # Statistics
         self.stats = {
             "buildings_processed": 0,
@@ -295,25 +751,46 @@ class MapGenerator:
     
     def process_osm_data(self, osm_data: dict):
         """Process OSM data and populate the Ultima map."""
-        elements = osm_data.get("elements", [])
-        
-        # First pass: cache all nodes
+        self.process_osm_elements(osm_data.get("elements", []))
+    
+    def process_osm_elements(self, elements: Iterable[dict]):
+        """Process a stream of OSM elements and populate the Ultima map."""
+        # Ingest pass: cache node coordinates and keep only the features,
+        # classified once as (kind, element). Untagged nodes are reduced to a
+        # coordinate pair as they arrive; ways with no handled tag are dropped.
+        features = []
+        nodes = self.nodes
+        add_feature = features.append
+        way_kind = self._way_kind
+        element_count = 0
         for element in elements:
+            element_count += 1
             if element["type"] == "node":
-                self.nodes[element["id"]] = (element["lon"], element["lat"])
+                nodes[element["id"]] = (element["lon"], element["lat"])
+                if "tags" in element:
+                    add_feature(("node", element))
+            elif element["type"] == "way":
+                kind = way_kind(element.get("tags", {}))
+                if kind is not None:
+                    add_feature((kind, element))
         
-        # Second pass: process ways and relations
-        for element in elements:
-            if element["type"] == "way":
-                self._process_way(element)
-            elif element["type"] == "node" and "tags" in element:
-                self._process_node(element)
+        # Second pass: process features in their original order, since later
+        # features draw over earlier ones
+        process_way = self._process_way
+        process_node = self._process_node
+        for kind, element in features:
+            if kind == "node":
+                process_node(element)
+            else:
+                process_way(element, kind)
         
-        # Fill in default terrain for empty areas
+        # Rasterize the queued terrain, then fill in default terrain for empty areas
+        burn_bands(self.ultima_map.terrain, self.terrain_ops, self.raster_seed, self.workers)
+        self.terrain_ops.clear()
         self._fill_default_terrain()
         
-        print(f"Processed {len(elements)} OSM elements")
-        print(f"Generated {len(self.ultima_map.chunks)} chunks")
+        print(f"Processed {element_count} OSM elements")
+        print(f"Generated {self.map_size[0] * self.map_size[1]} chunks")
     
     def _process_node(self, node: dict):
         """Process a single OSM node (point feature)."""
@@ -338,19 +815,26 @@ class MapGenerator:
                 )
                 self.ultima_map.add_object(obj)
     
-    def _process_way(self, way: dict):
-        """Process a single OSM way (line or polygon)."""
+    def _way_kind(self, tags: dict) -> Optional[str]:
+        """Return the first of WAY_KINDS present in tags, or None."""
+        for kind in self.WAY_KINDS:
+            if kind in tags:
+                return kind
+        return None
+    
+    def _process_way(self, way: dict, kind: Optional[str] = None):
+        """Process a single OSM way (line or polygon) of the given WAY_KINDS kind."""
         tags = way.get("tags", {})
         nodes = way.get("nodes", [])
         
-        if not nodes:
+        if kind is None:
+            kind = self._way_kind(tags)
+        if kind is None or not nodes:
             return
         
         # Get coordinates for all nodes in the way
-        coords = []
-        for node_id in nodes:
-            if node_id in self.nodes:
-                coords.append(self.nodes[node_id])
+        lookup = self.nodes.get
+        coords = [coord for coord in map(lookup, nodes) if coord is not None]
         
         if not coords:
             return
@@ -358,23 +842,26 @@ class MapGenerator:
         # Check if it's a closed way (polygon)
         is_polygon = len(nodes) > 2 and nodes[0] == nodes[-1]
         
-        # Process based on tags
-        if "highway" in tags:
+        # Process based on kind
+        if kind == "highway":
             self._process_highway(tags, coords)
-        elif "building" in tags:
+        elif kind == "building":
             self._process_building(tags, coords)
-        elif "landuse" in tags or "natural" in tags:
-            self._process_area(tags, coords, is_polygon)
-        elif "waterway" in tags:
+        elif kind == "waterway":
             self._process_waterway(tags, coords)
-        elif "barrier" in tags:
+        elif kind == "barrier":
             self._process_barrier(tags, coords)
+        else:
+            self._process_area(tags, coords, is_polygon)
     
     def _process_highway(self, tags: dict, coords: List[Tuple[float, float]]):
         """Process a road/path with variable width and intersection detection."""
         highway_type = tags.get("highway", "residential")
-        terrain_type = OSM_HIGHWAY_TO_TERRAIN.get(highway_type, "cobblestone")
-        terrain_shapes = TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["cobblestone"])
+        tag_id = HIGHWAY_TAG_ID.get(highway_type)
+        if tag_id is not None:
+            terrain_shapes = terrain_shape_array(HIGHWAY_TERRAIN_LUT[tag_id])
+        else:
+            terrain_shapes = TERRAIN_SHAPE_ARRAYS["cobblestone"]
 
         # Get road width based on highway type
         width = self.HIGHWAY_WIDTHS.get(highway_type, 2)
@@ -383,14 +870,17 @@ class MapGenerator:
         is_bridge = tags.get("bridge") == "yes" or tags.get("man_made") == "bridge"
 
         # Draw the road as a line of terrain tiles
-        for i in range(len(coords) - 1):
+        draw_bridge = self._draw_bridge
+        draw_line = self._draw_line_terrain
+        track_segment = self._track_road_segment
+        for start, end in zip(coords, coords[1:]):
             if is_bridge:
-                self._draw_bridge(coords[i], coords[i + 1], width)
+                draw_bridge(start, end, width)
             else:
-                self._draw_line_terrain(coords[i], coords[i + 1], terrain_shapes, width=width)
+                draw_line(start, end, terrain_shapes, width=width)
 
             # Track road tiles for intersection detection
-            self._track_road_segment(coords[i], coords[i + 1], highway_type, width)
+            track_segment(start, end, highway_type, width)
 
         self.stats["roads_processed"] += 1
 
@@ -400,122 +890,78 @@ class MapGenerator:
         start_tile = self.transformer.osm_to_ultima(start[0], start[1])
         end_tile = self.transformer.osm_to_ultima(end[0], end[1])
 
-        dx = abs(end_tile[0] - start_tile[0])
-        dy = abs(end_tile[1] - start_tile[1])
-        dist = max(dx, dy)
+        tag_id = HIGHWAY_TAG_ID.get(highway_type)
+        road_id = tag_id + 1 if tag_id is not None else self.ROAD_OTHER
 
-        if dist == 0:
-            self.road_tiles[(start_tile[0], start_tile[1])] = highway_type
+        if start_tile == end_tile:
+            self.road_grid[start_tile[1], start_tile[0]] = road_id
             return
 
-        for i in range(dist + 1):
-            t = i / dist
-            x = int(start_tile[0] + t * (end_tile[0] - start_tile[0]))
-            y = int(start_tile[1] + t * (end_tile[1] - start_tile[1]))
-
-            for wx in range(-width // 2, width // 2 + 1):
-                for wy in range(-width // 2, width // 2 + 1):
-                    tile_key = (x + wx, y + wy)
-                    # Mark as intersection if already a road tile
-                    if tile_key in self.road_tiles:
-                        self.road_tiles[tile_key] = "intersection"
-                    else:
-                        self.road_tiles[tile_key] = highway_type
+        # Already-marked tiles become intersections
+        mark_thick_line(self.road_grid, *start_tile, *end_tile, width, road_id, self.ROAD_INTERSECTION)
 
     def _draw_bridge(self, start: Tuple[float, float], end: Tuple[float, float], width: int):
         """Draw a bridge structure."""
-        bridge_shapes = OBJECT_SHAPES.get("bridge", [212, 213, 214, 215])
-        planking_shapes = TERRAIN_SHAPES.get("planking", [17])
+        bridge_shapes = OBJECT_SHAPES.get("bridge", (212, 213, 214, 215))
+        planking_shapes = TERRAIN_SHAPE_ARRAYS["planking"]
 
         start_tile = self.transformer.osm_to_ultima(start[0], start[1])
         end_tile = self.transformer.osm_to_ultima(end[0], end[1])
 
-        dx = abs(end_tile[0] - start_tile[0])
-        dy = abs(end_tile[1] - start_tile[1])
-        dist = max(dx, dy)
-
-        if dist == 0:
+        if start_tile == end_tile:
             return
 
-        for i in range(dist + 1):
-            t = i / dist
-            x = int(start_tile[0] + t * (end_tile[0] - start_tile[0]))
-            y = int(start_tile[1] + t * (end_tile[1] - start_tile[1]))
-
-            # Draw planking terrain for walkable surface
-            for wx in range(-width // 2, width // 2 + 1):
-                for wy in range(-width // 2, width // 2 + 1):
-                    tx, ty = x + wx, y + wy
-                    if 0 <= tx < self.map_size[0] * 16 and 0 <= ty < self.map_size[1] * 16:
-                        self.ultima_map.set_terrain(tx, ty, random.choice(planking_shapes))
+        # Draw planking terrain for walkable surface
+        self._draw_line_terrain(start, end, planking_shapes, width=width)
 
-            # Place bridge structure objects at edges
-            if i == 0 or i == dist:
-                obj = UltimaObject(
-                    shape=random.choice(bridge_shapes),
-                    x=x, y=y, lift=0
-                )
-                self.ultima_map.add_object(obj)
+        # Place bridge structure objects at edges
+        for x, y in (start_tile, end_tile):
+            obj = UltimaObject(
+                shape=random.choice(bridge_shapes),
+                x=x, y=y, lift=0
+            )
+            self.ultima_map.add_object(obj)
     
     def _process_building(self, tags: dict, coords: List[Tuple[float, float]]):
         """Process a building polygon with interior generation."""
         if len(coords) < 3:
             return
 
-        # Get building center
-        center_lon = sum(c[0] for c in coords) / len(coords)
-        center_lat = sum(c[1] for c in coords) / len(coords)
-        center_tile = self.transformer.osm_to_ultima(center_lon, center_lat)
-
         # Calculate approximate building size in tiles
-        min_x = min(self.transformer.osm_to_ultima(c[0], c[1])[0] for c in coords)
-        max_x = max(self.transformer.osm_to_ultima(c[0], c[1])[0] for c in coords)
-        min_y = min(self.transformer.osm_to_ultima(c[0], c[1])[1] for c in coords)
-        max_y = max(self.transformer.osm_to_ultima(c[0], c[1])[1] for c in coords)
+        tiles = self.transformer.osm_to_ultima_batch(coords)
+        min_x, min_y = tiles.min(axis=0).tolist()
+        max_x, max_y = tiles.max(axis=0).tolist()
 
         width = max(1, max_x - min_x)
         height = max(1, max_y - min_y)
 
         # Get building components
         building_type = tags.get("building", "house")
-        shapes = get_object_shapes(tags)
+        shapes = get_object_shape_arrays(tags)
 
         # Place floor
-        floor_shapes = TERRAIN_SHAPES.get("floor", [189])
-        for x in range(min_x, max_x + 1):
-            for y in range(min_y, max_y + 1):
-                self.ultima_map.set_terrain(x, y, random.choice(floor_shapes))
-
-        # Place walls around perimeter
-        wall_shapes = shapes.get("walls", OBJECT_SHAPES.get("wall", [151]))
-        for x in range(min_x, max_x + 1):
-            # Top wall
-            obj = UltimaObject(shape=random.choice(wall_shapes), x=x, y=min_y, lift=0)
-            self.ultima_map.add_object(obj)
-            # Bottom wall
-            obj = UltimaObject(shape=random.choice(wall_shapes), x=x, y=max_y, lift=0)
-            self.ultima_map.add_object(obj)
-
-        for y in range(min_y + 1, max_y):
-            # Left wall
-            obj = UltimaObject(shape=random.choice(wall_shapes), x=min_x, y=y, lift=0)
-            self.ultima_map.add_object(obj)
-            # Right wall
-            obj = UltimaObject(shape=random.choice(wall_shapes), x=max_x, y=y, lift=0)
-            self.ultima_map.add_object(obj)
+        floor_shapes = TERRAIN_SHAPE_ARRAYS["floor"]
+        self.terrain_ops.append((RECT, (min_x, max_x), (min_y, max_y), floor_shapes, 0))
+
+        # Place walls around perimeter (top and bottom rows, then left and right columns)
+        wall_shapes = shapes.get("walls", OBJECT_SHAPE_ARRAYS["wall"])
+        row = np.arange(min_x, max_x + 1)
+        col = np.arange(min_y + 1, max_y)
+        wall_x = np.concatenate([row, row, np.full(len(col), min_x), np.full(len(col), max_x)])
+        wall_y = np.concatenate([np.full(len(row), min_y), np.full(len(row), max_y), col, col])
+        self.ultima_map.add_records(object_records(
+            self.rng.choice(wall_shapes, size=len(wall_x)), wall_x, wall_y))
 
         # Place door
-        door_shapes = shapes.get("door", OBJECT_SHAPES.get("door", [270]))
+        door_shapes = shapes.get("door", OBJECT_SHAPE_ARRAYS["door"])
         door_x = (min_x + max_x) // 2
         obj = UltimaObject(shape=random.choice(door_shapes), x=door_x, y=max_y, lift=0)
         self.ultima_map.add_object(obj)
 
-        # Place roof (on lift level 4)
-        roof_shapes = shapes.get("roof", OBJECT_SHAPES.get("roof_slate", [164]))
-        for x in range(min_x, max_x + 1):
-            for y in range(min_y, max_y + 1):
-                obj = UltimaObject(shape=random.choice(roof_shapes), x=x, y=y, lift=4)
-                self.ultima_map.add_object(obj)
+        # Place roof (exported as objects on lift level 4)
+        roof_shapes = shapes.get("roof", OBJECT_SHAPE_ARRAYS["roof_slate"])
+        self.ultima_map.roof[min_y:max_y + 1, min_x:max_x + 1] = self.rng.choice(
+            roof_shapes, size=(max_y - min_y + 1, max_x - min_x + 1))
 
         # Generate interior for buildings with sufficient size
         if width >= 4 and height >= 4:
@@ -574,11 +1020,10 @@ class MapGenerator:
             })
 
             # Add interior wall
-            wall_shapes = OBJECT_SHAPES.get("wall", [151])
-            for x in range(min_x, max_x + 1):
-                if x != (min_x + max_x) // 2:  # Leave doorway
-                    obj = UltimaObject(shape=random.choice(wall_shapes), x=x, y=mid_y, lift=0)
-                    self.ultima_map.add_object(obj)
+            wall_x = np.arange(min_x, max_x + 1)
+            wall_x = wall_x[wall_x != (min_x + max_x) // 2]  # Leave doorway
+            self.ultima_map.add_records(object_records(
+                self.rng.choice(OBJECT_SHAPE_ARRAYS["wall"], size=len(wall_x)), wall_x, mid_y))
 
         elif building_type in ["shop", "retail", "commercial"]:
             # Split into showroom and storage
@@ -645,58 +1090,40 @@ class MapGenerator:
         if not furniture_list:
             return
 
-        room_width = room["max_x"] - room["min_x"]
-        room_height = room["max_y"] - room["min_y"]
-
-        # Place furniture items
-        placed_positions = set()
+        # Place furniture items, each on its own free tile
+        positions = self._shuffled_positions(room["min_x"], room["min_y"], room["max_x"], room["max_y"],
+                                             len(furniture_list))
 
         for furniture_name in furniture_list:
             furniture_shapes = get_furniture_shapes(furniture_name)
             if not furniture_shapes:
                 continue
 
-            # Find a position for this furniture
-            attempts = 0
-            while attempts < 10:
-                x = random.randint(room["min_x"], room["max_x"])
-                y = random.randint(room["min_y"], room["max_y"])
+            pos = next(positions, None)
+            if pos is None:
+                break
 
-                if (x, y) not in placed_positions:
-                    obj = UltimaObject(
-                        shape=random.choice(furniture_shapes),
-                        x=x, y=y, lift=0
-                    )
-                    self.ultima_map.add_object(obj)
-                    placed_positions.add((x, y))
-                    break
+            obj = UltimaObject(
+                shape=random.choice(furniture_shapes),
+                x=pos[0], y=pos[1], lift=0
+            )
+            self.ultima_map.add_object(obj)
 
-                attempts += 1
+    def _shuffled_positions(self, min_x: int, min_y: int, max_x: int, max_y: int,
+                            k: int) -> Iterator[Tuple[int, int]]:
+        """Iterate over up to k distinct random tiles of a rectangle (empty if it is degenerate)."""
+        width = max_x - min_x + 1
+        height = max_y - min_y + 1
+        if width <= 0 or height <= 0:
+            return iter(())
+        indices = self.rng.choice(width * height, size=min(k, width * height), replace=False).tolist()
+        return ((min_x + i // height, min_y + i % height) for i in indices)
 
     def _place_building_npcs(self, building_type: str, min_x: int, min_y: int,
                              max_x: int, max_y: int):
         """Place NPCs appropriate to building type with dialogue data."""
         # Determine NPC types for this building
-        npc_mapping = {
-            "house": ["townsman", "townswoman"],
-            "residential": ["townsman", "townswoman", "child"],
-            "shop": ["shopkeeper"],
-            "retail": ["shopkeeper"],
-            "commercial": ["shopkeeper", "townsman"],
-            "church": ["sage"],
-            "castle": ["guard", "noble_male", "noble_female"],
-            "fort": ["guard", "fighter"],
-            "government": ["guard", "noble_male"],
-            "hospital": ["sage"],
-            "school": ["sage"],
-            "tavern": ["entertainer", "townsman", "townswoman"],
-            "farm": ["farmer"],
-            "barn": ["farmer"],
-            "industrial": ["blacksmith", "townsman"],
-            "warehouse": ["townsman"],
-        }
-
-        npc_types = npc_mapping.get(building_type, ["townsman"])
+        npc_types = _NPC_BY_BUILDING.get(building_type, _NPC_DEFAULT_TYPES)
 
         # Calculate building size for NPC count
         width = max_x - min_x
@@ -714,108 +1141,67 @@ class MapGenerator:
             max_npcs = 3
             npc_chance = 0.6
 
-        if random.random() > npc_chance:
+        rng = self.rng
+        if rng.random() > npc_chance:
             return
 
-        num_npcs = random.randint(1, max_npcs)
-        placed_positions = set()
+        num_npcs = int(rng.integers(1, max_npcs + 1))
+        positions = self._shuffled_positions(min_x, min_y, max_x, max_y, num_npcs)
         building_npcs = []  # Track NPCs in this building for relationships
 
         for _ in range(num_npcs):
-            npc_type = random.choice(npc_types)
+            npc_type = npc_types[rng.integers(len(npc_types))]
             npc_data = get_npc_with_dialogue(npc_type)
 
             if not npc_data or not npc_data.get("shapes"):
                 continue
 
             # Find position for NPC
-            attempts = 0
-            while attempts < 10:
-                x = random.randint(min_x, max_x)
-                y = random.randint(min_y, max_y)
-
-                if (x, y) not in placed_positions:
-                    shape = random.choice(npc_data["shapes"])
-                    npc = UltimaObject(
-                        shape=shape,
-                        x=x, y=y, lift=0,
-                        quality=hash(npc_type) % 256  # Store NPC type info
-                    )
-                    self.ultima_map.add_object(npc)
-                    placed_positions.add((x, y))
-                    self.stats["npcs_placed"] += 1
-
-                    # Create NPC profile for AI integration
-                    profile = self._create_npc_profile(
-                        npc_type, building_type, x, y, shape, npc_data
-                    )
-                    self.npc_profiles.append(profile)
-                    building_npcs.append(profile.id)
-                    break
-
-                attempts += 1
+            pos = next(positions, None)
+            if pos is None:
+                break
+            x, y = pos
+
+            shape = npc_data["shapes"][rng.integers(len(npc_data["shapes"]))]
+            npc = UltimaObject(
+                shape=shape,
+                x=x, y=y, lift=0,
+                quality=NPC_TYPE_QUALITY.get(npc_type, 0)  # Store NPC type info
+            )
+            self.ultima_map.add_object(npc)
+            self.stats["npcs_placed"] += 1
+
+            # Create NPC profile for AI integration
+            profile = self._create_npc_profile(
+                npc_type, building_type, x, y, shape, npc_data
+            )
+            self.npc_profiles.append(profile)
+            building_npcs.append(profile.id)
 
         # Create relationships between NPCs in the same building
         self._create_building_relationships(building_npcs)
 
+    def _rng_for(self, id_str: str) -> np.random.Generator:
+        """Independent, reproducible RNG for one NPC, seeded from the run seed and its id."""
+        return np.random.Generator(np.random.PCG64([self.npc_seed, hash64(id_str)]))
+
     def _create_npc_profile(self, npc_type: str, building_type: str,
                             x: int, y: int, shape: int, npc_data: Dict) -> NPCProfile:
         """Create an NPC profile with personality traits based on profession."""
         self.npc_counter += 1
         npc_id = f"npc_{self.npc_counter:04d}"
 
-        # Generate name (simple procedural names)
-        first_names_male = ["Gareth", "Aldric", "Cedric", "Edmund", "Roland",
-                           "Geoffrey", "Wilfred", "Oswald", "Reginald", "Bernard"]
-        first_names_female = ["Elara", "Beatrice", "Gwyneth", "Isolde", "Rowena",
-                             "Millicent", "Cordelia", "Elowen", "Rosalind", "Lysandra"]
-
-        is_female = npc_type in ["townswoman", "noble_female"]
-        names = first_names_female if is_female else first_names_male
-        name = random.choice(names)
-
-        # Personality traits based on profession
-        personality_profiles = {
-            "townsman": {"o": 0.4, "c": 0.5, "e": 0.5, "a": 0.6, "n": 0.4},
-            "townswoman": {"o": 0.5, "c": 0.6, "e": 0.5, "a": 0.7, "n": 0.4},
-            "child": {"o": 0.8, "c": 0.3, "e": 0.8, "a": 0.6, "n": 0.5},
-            "guard": {"o": 0.3, "c": 0.8, "e": 0.4, "a": 0.4, "n": 0.3},
-            "shopkeeper": {"o": 0.5, "c": 0.7, "e": 0.7, "a": 0.6, "n": 0.3},
-            "blacksmith": {"o": 0.4, "c": 0.8, "e": 0.4, "a": 0.5, "n": 0.3},
-            "farmer": {"o": 0.3, "c": 0.7, "e": 0.4, "a": 0.6, "n": 0.4},
-            "mage": {"o": 0.9, "c": 0.6, "e": 0.3, "a": 0.4, "n": 0.5},
-            "sage": {"o": 0.8, "c": 0.7, "e": 0.3, "a": 0.6, "n": 0.3},
-            "noble_male": {"o": 0.5, "c": 0.6, "e": 0.6, "a": 0.3, "n": 0.4},
-            "noble_female": {"o": 0.6, "c": 0.6, "e": 0.5, "a": 0.4, "n": 0.5},
-            "entertainer": {"o": 0.8, "c": 0.4, "e": 0.9, "a": 0.7, "n": 0.5},
-            "beggar": {"o": 0.4, "c": 0.3, "e": 0.4, "a": 0.5, "n": 0.7},
-            "fighter": {"o": 0.4, "c": 0.6, "e": 0.5, "a": 0.3, "n": 0.4},
-            "ranger": {"o": 0.6, "c": 0.6, "e": 0.3, "a": 0.5, "n": 0.3},
-        }
+        # Generate name
+        names = _FIRST_NAMES_F if npc_type in _FEMALE_NPC_TYPES else _FIRST_NAMES_M
+        rng = self._rng_for(npc_id)
+        name = names[rng.integers(len(names))]
 
-        base_traits = personality_profiles.get(npc_type, {"o": 0.5, "c": 0.5, "e": 0.5, "a": 0.5, "n": 0.5})
+        base_traits = _NPC_PERSONALITY.get(npc_type, _NPC_DEFAULT_PERSONALITY)
 
         # Add some random variation (+/- 0.15)
-        def vary(base: float) -> float:
-            return max(0.0, min(1.0, base + random.uniform(-0.15, 0.15)))
-
-        # Knowledge domains based on profession
-        knowledge_mapping = {
-            "townsman": ["local_gossip", "town_history"],
-            "townswoman": ["local_gossip", "town_history", "cooking"],
-            "child": ["games", "local_secrets"],
-            "guard": ["combat", "law", "town_security"],
-            "shopkeeper": ["commerce", "goods", "local_economy"],
-            "blacksmith": ["smithing", "weapons", "armor", "metallurgy"],
-            "farmer": ["agriculture", "weather", "animals"],
-            "mage": ["magic", "arcana", "history", "alchemy"],
-            "sage": ["history", "lore", "religion", "medicine"],
-            "noble_male": ["politics", "heraldry", "etiquette"],
-            "noble_female": ["politics", "heraldry", "etiquette", "fashion"],
-            "entertainer": ["music", "stories", "gossip", "performance"],
-            "fighter": ["combat", "weapons", "tactics"],
-            "ranger": ["nature", "tracking", "survival", "beasts"],
-        }
+        base = np.array([base_traits[k] for k in "ocean"])
+        traits = np.clip(base + rng.uniform(-0.15, 0.15, 5), 0.0, 1.0).tolist()
+        openness, conscientiousness, extraversion, agreeableness, neuroticism = traits
 
         return NPCProfile(
             id=npc_id,
@@ -824,14 +1210,14 @@ class MapGenerator:
             building_type=building_type,
             location=(x, y),
             shape=shape,
-            openness=vary(base_traits["o"]),
-            conscientiousness=vary(base_traits["c"]),
-            extraversion=vary(base_traits["e"]),
-            agreeableness=vary(base_traits["a"]),
-            neuroticism=vary(base_traits["n"]),
+            openness=openness,
+            conscientiousness=conscientiousness,
+            extraversion=extraversion,
+            agreeableness=agreeableness,
+            neuroticism=neuroticism,
             dialogues=npc_data.get("dialogues", []),
             schedule=npc_data.get("schedule", "daytime"),
-            knowledge_domains=knowledge_mapping.get(npc_type, ["general"]),
+            knowledge_domains=list(_NPC_KNOWLEDGE.get(npc_type, _NPC_DEFAULT_KNOWLEDGE)),
         )
 
     def _create_building_relationships(self, npc_ids: List[str]):
@@ -839,292 +1225,296 @@ class MapGenerator:
         if len(npc_ids) < 2:
             return
 
+        members = set(npc_ids)
         for profile in self.npc_profiles:
-            if profile.id in npc_ids:
-                for other_id in npc_ids:
-                    if other_id != profile.id:
-                        # Positive relationship for building-mates (0.3-0.7)
-                        profile.relationships[other_id] = random.uniform(0.3, 0.7)
+            if profile.id in members:
+                # The NPC's own generator, jumped past the stream its name
+                # and traits were drawn from
+                rng = np.random.Generator(self._rng_for(profile.id).bit_generator.jumped())
+                others = [other_id for other_id in npc_ids if other_id != profile.id]
+                # Positive relationship for building-mates (0.3-0.7)
+                for other_id, strength in zip(others, rng.uniform(0.3, 0.7, len(others)).tolist()):
+                    profile.relationships[other_id] = strength
     
     def _process_area(self, tags: dict, coords: List[Tuple[float, float]], is_polygon: bool):
         """Process a landuse or natural area."""
-        terrain_shapes = get_terrain_shape(tags)
+        terrain_shapes = get_terrain_shape_array(tags)
         
         if is_polygon and len(coords) >= 3:
             # Fill polygon with terrain
             self._fill_polygon_terrain(coords, terrain_shapes)
         else:
             # Draw as line
-            for i in range(len(coords) - 1):
-                self._draw_line_terrain(coords[i], coords[i + 1], terrain_shapes, width=1)
+            draw_line = self._draw_line_terrain
+            for start, end in zip(coords, coords[1:]):
+                draw_line(start, end, terrain_shapes, width=1)
         
         # Add natural objects (trees, rocks, etc.)
-        shapes = get_object_shapes(tags)
+        shapes = get_object_shape_arrays(tags)
         if shapes and "main" in shapes:
             # Scatter objects in the area
-            for coord in coords[::3]:  # Every 3rd coordinate
-                tile = self.transformer.osm_to_ultima(coord[0], coord[1])
-                obj = UltimaObject(
-                    shape=random.choice(shapes["main"]),
-                    x=tile[0],
-                    y=tile[1],
-                    lift=0
-                )
-                self.ultima_map.add_object(obj)
+            tiles = self.transformer.osm_to_ultima_batch(coords[::3])  # Every 3rd coordinate
+            self.ultima_map.add_records(object_records(
+                self.rng.choice(shapes["main"], size=len(tiles)), tiles[:, 0], tiles[:, 1]))
     
     def _process_waterway(self, tags: dict, coords: List[Tuple[float, float]]):
         """Process a waterway (river, stream, etc.)."""
-        water_shapes = TERRAIN_SHAPES.get("water", [8])
+        water_shapes = TERRAIN_SHAPE_ARRAYS["water"]
         
         # Draw water as a line
-        for i in range(len(coords) - 1):
-            self._draw_line_terrain(coords[i], coords[i + 1], water_shapes, width=3)
+        draw_line = self._draw_line_terrain
+        for start, end in zip(coords, coords[1:]):
+            draw_line(start, end, water_shapes, width=3)
     
     def _process_barrier(self, tags: dict, coords: List[Tuple[float, float]]):
         """Process a barrier (fence, wall, etc.)."""
-        shapes = get_object_shapes(tags)
+        shapes = get_object_shape_arrays(tags)
         
         if shapes and "main" in shapes:
             barrier_shapes = shapes["main"]
             
-            # Place barrier objects along the line
-            for i in range(len(coords) - 1):
-                start = self.transformer.osm_to_ultima(coords[i][0], coords[i][1])
-                end = self.transformer.osm_to_ultima(coords[i + 1][0], coords[i + 1][1])
-                
-                # Interpolate points
-                dist = max(abs(end[0] - start[0]), abs(end[1] - start[1]))
-                if dist == 0:
-                    continue
-                
-                for j in range(dist + 1):
-                    t = j / dist
-                    x = int(start[0] + t * (end[0] - start[0]))
-                    y = int(start[1] + t * (end[1] - start[1]))
-                    
-                    obj = UltimaObject(
-                        shape=random.choice(barrier_shapes),
-                        x=x,
-                        y=y,
-                        lift=0
-                    )
-                    self.ultima_map.add_object(obj)
+            # Place barrier objects along the line, all segments in one batch
+            tiles = self.transformer.osm_to_ultima_batch(coords).tolist()
+            points = []
+            for start, end in zip(tiles, tiles[1:]):
+                if start != end:
+                    points.extend(bresenham_points(*start, *end))
+            
+            if points:
+                xs, ys = np.array(points).T
+                self.ultima_map.add_records(object_records(
+                    self.rng.choice(barrier_shapes, size=len(points)), xs, ys))
     
     def _draw_line_terrain(self, start: Tuple[float, float], end: Tuple[float, float], 
                            shapes: List[int], width: int = 1):
-        """Draw a line of terrain tiles."""
+        """Draw a line of terrain tiles. shapes may be a list or a NumPy array."""
         start_tile = self.transformer.osm_to_ultima(start[0], start[1])
         end_tile = self.transformer.osm_to_ultima(end[0], end[1])
         
-        # Bresenham-like line drawing
-        dx = abs(end_tile[0] - start_tile[0])
-        dy = abs(end_tile[1] - start_tile[1])
-        dist = max(dx, dy)
-        
-        if dist == 0:
-            self.ultima_map.set_terrain(start_tile[0], start_tile[1], random.choice(shapes))
-            return
+        # A degenerate segment only marks its own tile
+        if start_tile == end_tile:
+            width = 0
         
-        for i in range(dist + 1):
-            t = i / dist
-            x = int(start_tile[0] + t * (end_tile[0] - start_tile[0]))
-            y = int(start_tile[1] + t * (end_tile[1] - start_tile[1]))
-            
-            # Draw with width
-            for wx in range(-width // 2, width // 2 + 1):
-                for wy in range(-width // 2, width // 2 + 1):
-                    tx, ty = x + wx, y + wy
-                    if 0 <= tx < self.map_size[0] * 16 and 0 <= ty < self.map_size[1] * 16:
-                        self.ultima_map.set_terrain(tx, ty, random.choice(shapes))
+        self.terrain_ops.append((LINE, (start_tile[0], end_tile[0]), (start_tile[1], end_tile[1]),
+                                 np.asarray(shapes), width))
     
     def _fill_polygon_terrain(self, coords: List[Tuple[float, float]], shapes: List[int]):
         """Fill a polygon with terrain tiles using scanline algorithm."""
-        # Convert to tile coordinates
-        tile_coords = [self.transformer.osm_to_ultima(c[0], c[1]) for c in coords]
-        
-        if not tile_coords:
+        if not coords:
             return
         
-        # Get bounding box
-        min_x = min(c[0] for c in tile_coords)
-        max_x = max(c[0] for c in tile_coords)
-        min_y = min(c[1] for c in tile_coords)
-        max_y = max(c[1] for c in tile_coords)
-        
-        # Simple scanline fill
-        for y in range(min_y, max_y + 1):
-            for x in range(min_x, max_x + 1):
-                if self._point_in_polygon(x, y, tile_coords):
-                    self.ultima_map.set_terrain(x, y, random.choice(shapes))
-    
-    def _point_in_polygon(self, x: int, y: int, polygon: List[Tuple[int, int]]) -> bool:
-        """Check if a point is inside a polygon using ray casting."""
-        n = len(polygon)
-        inside = False
-        
-        j = n - 1
-        for i in range(n):
-            xi, yi = polygon[i]
-            xj, yj = polygon[j]
-            
-            if ((yi > y) != (yj > y)) and (x < (xj - xi) * (y - yi) / (yj - yi) + xi):
-                inside = not inside
-            
-            j = i
-        
-        return inside
+        # Convert to tile coordinates in one vectorized pass
+        lons = np.fromiter((c[0] for c in coords), dtype=np.float64, count=len(coords))
+        lats = np.fromiter((c[1] for c in coords), dtype=np.float64, count=len(coords))
+        xs, ys = self.transformer.transform_many(lons, lats)
+        self.terrain_ops.append((POLYGON, xs, ys, np.asarray(shapes), 0))
     
     def _fill_default_terrain(self):
         """Fill empty areas with default grass terrain."""
-        grass_shapes = TERRAIN_SHAPES["grass"]
-        
-        for cy in range(self.map_size[1]):
-            for cx in range(self.map_size[0]):
-                chunk = self.ultima_map.get_chunk(cx, cy)
-                for ly in range(16):
-                    for lx in range(16):
-                        if chunk.terrain[ly][lx] == 4:  # default grass
-                            chunk.terrain[ly][lx] = random.choice(grass_shapes)
+        terrain = self.ultima_map.terrain
+
+        mask = terrain == 4  # default grass
+        terrain[mask] = sample_terrain("grass", int(np.count_nonzero(mask)), self.rng)
 
 
 # =============================================================================
 # MAP EXPORTER
 # =============================================================================
 
+# Characters for the ASCII terrain map
+_TERRAIN_CHARS = {
+    "grass": ".",
+    "water": "~",
+    "cobblestone": "#",
+    "dirt": ",",
+    "sand": ":",
+    "swamp": "%",
+    "floor": "_",
+}
+
+
+def _build_char_lut() -> np.ndarray:
+    """Reverse lookup: shape -> char, as a table indexed by shape id."""
+    lut = np.full(1 << 16, ord("?"), dtype=np.uint8)
+    for shape, terrain_type in SHAPE_TO_TERRAIN.items():
+        lut[shape] = ord(_TERRAIN_CHARS.get(terrain_type, "?"))
+    return lut
+
+
+_TERRAIN_CHAR_LUT = _build_char_lut()
+
+
+# Fixed-layout GeoJSON features, filled with %-formatting instead of
+# building and serializing a dict per feature
+_GEOJSON_TERRAIN_RUN = (b'{"type":"Feature","geometry":{"type":"Polygon",'
+                        b'"coordinates":[[[%d,%d],[%d,%d],[%d,%d],[%d,%d],[%d,%d]]]},'
+                        b'"properties":{"type":"terrain","shape":%d,"len":%d}}')
+_GEOJSON_OBJECT = (b'{"type":"Feature","geometry":{"type":"Point","coordinates":[%d,%d,%d]},'
+                   b'"properties":{"type":"object","shape":%d,"frame":%d,"quality":%d,"lift":%d}}')
+
+
+def _encode_terrain_runs(band: np.ndarray, top: int) -> List[bytes]:
+    """One box polygon per horizontal run of identical shapes in a band of terrain rows."""
+    width = band.shape[1]
+    starts = np.ones(band.shape, dtype=bool)
+    starts[:, 1:] = band[:, 1:] != band[:, :-1]
+    rows, x0s = np.nonzero(starts)
+
+    # A run ends where the next one in the same row starts, or at the map edge
+    x1s = np.full_like(x0s, width)
+    same_row = rows[1:] == rows[:-1]
+    x1s[:-1][same_row] = x0s[1:][same_row]
+
+    shapes = band[rows, x0s].tolist()
+    template = _GEOJSON_TERRAIN_RUN
+    return [
+        template % (x0, y, x1, y, x1, y + 1, x0, y + 1, x0, y, shape, x1 - x0)
+        for y, x0, x1, shape in zip((rows + top).tolist(), x0s.tolist(), x1s.tolist(), shapes)
+    ]
+
+
+def _encode_objects(records: np.ndarray) -> List[bytes]:
+    """One point feature per object record."""
+    columns = (records[name].tolist() for name in ("shape", "frame", "x", "y", "lift", "quality"))
+    template = _GEOJSON_OBJECT
+    return [
+        template % (x, y, lift, shape, frame, quality, lift)
+        for shape, frame, x, y, lift, quality in zip(*columns)
+    ]
+
+
+def _encode_geojson_job(job) -> bytes:
+    """Encode one batch of GeoJSON features (also run in worker processes)."""
+    kind, data, top = job
+    if kind == "terrain":
+        features = _encode_terrain_runs(data, top)
+    else:
+        features = _encode_objects(data)
+    return b",\n".join(features)
+
+
 class MapExporter:
     """Exports Ultima map to various formats."""
 
-    def __init__(self, ultima_map: UltimaMap, npc_profiles: List[NPCProfile] = None):
+    def __init__(self, ultima_map: UltimaMap, npc_profiles: List[NPCProfile] = None,
+                 workers: int = 1):
         self.ultima_map = ultima_map
         self.npc_profiles = npc_profiles or []
+        self.workers = workers
     
     def export_geojson(self, output_path: str):
-        """Export map as GeoJSON for visualization."""
-        features = []
-        
-        # Export terrain as points
-        for (cx, cy), chunk in self.ultima_map.chunks.items():
-            for ly in range(16):
-                for lx in range(16):
-                    tile_x = cx * 16 + lx
-                    tile_y = cy * 16 + ly
-                    shape = chunk.terrain[ly][lx]
-                    
-                    feature = {
-                        "type": "Feature",
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [tile_x, tile_y]
-                        },
-                        "properties": {
-                            "type": "terrain",
-                            "shape": shape,
-                            "chunk": [cx, cy],
-                            "local": [lx, ly]
-                        }
-                    }
-                    features.append(feature)
-            
-            # Export objects
-            for obj in chunk.objects:
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [obj.x, obj.y, obj.lift]
-                    },
-                    "properties": {
-                        "type": "object",
-                        "shape": obj.shape,
-                        "frame": obj.frame,
-                        "quality": obj.quality,
-                        "lift": obj.lift
-                    }
-                }
-                features.append(feature)
-        
-        geojson = {
-            "type": "FeatureCollection",
-            "features": features,
+        """Export map as GeoJSON for visualization.
+
+        Features are streamed to disk one batch at a time rather than
+        collected into a single FeatureCollection dict first. With
+        workers > 1 the batches are built and encoded in a process pool.
+        """
+        records = self.ultima_map.all_records()
+        metadata = {
+            "map_size_chunks": [self.ultima_map.width_chunks, self.ultima_map.height_chunks],
+            "map_size_tiles": [self.ultima_map.width_chunks * 16, self.ultima_map.height_chunks * 16],
+            "total_chunks": self.ultima_map.width_chunks * self.ultima_map.height_chunks,
+            "total_objects": len(records)
+        }
+
+        # Terrain one chunk row at a time, then the objects a chunk's worth at a time
+        terrain = self.ultima_map.terrain
+        jobs = [("terrain", terrain[top:top + 16], top) for top in range(0, terrain.shape[0], 16)]
+        jobs += [("objects", records[start:start + 256], 0) for start in range(0, len(records), 256)]
+
+        with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(b'{"type":"FeatureCollection","features":[\n')
+            if self.workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    self._write_features(f, executor.map(_encode_geojson_job, jobs, chunksize=4))
+            else:
+                self._write_features(f, map(_encode_geojson_job, jobs))
+            f.write(b'\n],"ultima_metadata":' + _json_dumps(metadata) + b"}\n")
+
+        print(f"Exported GeoJSON to {output_path}")
+
+    @staticmethod
+    def _write_features(f, parts: Iterable[bytes]):
+        """Write encoded feature batches, comma-separated, skipping empty ones."""
+        separator = b""
+        for part in parts:
+            if part:
+                f.write(separator)
+                f.write(part)
+                separator = b",\n"
+    
+    def export_binary(self, output_path: str):
+        """Export terrain and objects as MessagePack for programmatic consumers.
+
+        Terrain is the raw (H*16, W*16) shape grid and objects are one raw
+        column per record field; "dtypes" gives each array's NumPy dtype string.
+        """
+        records = self.ultima_map.all_records()
+        terrain = self.ultima_map.terrain
+        data = {
             "ultima_metadata": {
                 "map_size_chunks": [self.ultima_map.width_chunks, self.ultima_map.height_chunks],
                 "map_size_tiles": [self.ultima_map.width_chunks * 16, self.ultima_map.height_chunks * 16],
-                "total_chunks": len(self.ultima_map.chunks),
-                "total_objects": sum(len(c.objects) for c in self.ultima_map.chunks.values())
-            }
+                "total_chunks": self.ultima_map.width_chunks * self.ultima_map.height_chunks,
+                "total_objects": len(records)
+            },
+            "terrain": terrain.tobytes(),
+            "objects": {name: records[name].tobytes() for name in OBJECT_DTYPE.names},
+            "dtypes": {
+                "terrain": terrain.dtype.str,
+                **{name: OBJECT_DTYPE[name].str for name in OBJECT_DTYPE.names},
+            },
         }
-        
-        with open(output_path, "w") as f:
-            json.dump(geojson, f, indent=2)
-        
-        print(f"Exported GeoJSON to {output_path}")
+        _dump_msgpack(data, output_path)
+
+        print(f"Exported MessagePack map to {output_path}")
     
     def export_ireg(self, output_dir: str):
         """Export map objects in IREG format (Ultima VII format)."""
         os.makedirs(output_dir, exist_ok=True)
         
         # Group objects by superchunk (16x16 chunks)
-        for (cx, cy), chunk in self.ultima_map.chunks.items():
-            if not chunk.objects:
+        superchunks = defaultdict(list)
+        for cx, cy in self.ultima_map.chunks:
+            records = self.ultima_map.chunk_records(cx, cy)
+            if not len(records):
                 continue
             
             # Calculate superchunk
             scx = cx // 16
             scy = cy // 16
             sc_index = scy * 12 + scx
-            
+            superchunks[sc_index].append(records)
+        
+        # One write per superchunk file
+        for sc_index, parts in superchunks.items():
             filename = os.path.join(output_dir, f"u7ireg{sc_index:02x}")
-            
-            with open(filename, "ab") as f:  # append mode
-                for obj in chunk.objects:
-                    f.write(obj.to_ireg_bytes())
+            with open(filename, "wb") as f:
+                encode_ireg(np.concatenate(parts)).tofile(f)
         
         print(f"Exported IREG files to {output_dir}")
     
     def export_terrain_map(self, output_path: str):
         """Export terrain as a simple text map for visualization."""
-        terrain_chars = {
-            "grass": ".",
-            "water": "~",
-            "cobblestone": "#",
-            "dirt": ",",
-            "sand": ":",
-            "swamp": "%",
-            "floor": "_",
-        }
-        
-        # Reverse lookup: shape -> char
-        shape_to_char = {}
-        for terrain_type, shapes in TERRAIN_SHAPES.items():
-            char = terrain_chars.get(terrain_type, "?")
-            for shape in shapes:
-                shape_to_char[shape] = char
-        
-        lines = []
-        for cy in range(self.ultima_map.height_chunks):
-            for ly in range(16):
-                line = ""
-                for cx in range(self.ultima_map.width_chunks):
-                    chunk = self.ultima_map.get_chunk(cx, cy)
-                    for lx in range(16):
-                        shape = chunk.terrain[ly][lx]
-                        line += shape_to_char.get(shape, "?")
-                lines.append(line)
-        
-        with open(output_path, "w") as f:
-            f.write("\n".join(lines))
+        # Map every tile at once, then end each row with a newline
+        chars = _TERRAIN_CHAR_LUT[self.ultima_map.terrain]
+        newlines = np.full((chars.shape[0], 1), ord("\n"), dtype=np.uint8)
+        text = np.hstack((chars, newlines)).tobytes()[:-1]
+
+        with open(output_path, "wb") as f:
+            f.write(text)
         
         print(f"Exported terrain map to {output_path}")
     
-    def export_summary(self, output_path: str, generator_stats: Dict = None, seed: str = None):
-        """Export a summary of the generated map."""
-        total_objects = sum(len(c.objects) for c in self.ultima_map.chunks.values())
+    def export_summary(self, output_path: str, generator_stats: Dict = None, seed: str = None,
+                       pretty: bool = True):
+        """Export a summary of the generated map (indented by default, since people read it)."""
+        records = self.ultima_map.all_records()
+        total_objects = len(records)
 
-        # Count shapes
-        shape_counts = {}
-        for chunk in self.ultima_map.chunks.values():
-            for obj in chunk.objects:
-                shape_counts[obj.shape] = shape_counts.get(obj.shape, 0) + 1
+        # Count shapes and keep the 20 most common, ties in shape order
+        shapes, counts = np.unique(records["shape"], return_counts=True)
+        top = np.argsort(-counts, kind="stable")[:20]
 
         summary = {
             "map_size": {
@@ -1132,11 +1522,11 @@ class MapExporter:
                 "tiles": [self.ultima_map.width_chunks * 16, self.ultima_map.height_chunks * 16]
             },
             "statistics": {
-                "total_chunks": len(self.ultima_map.chunks),
+                "total_chunks": self.ultima_map.width_chunks * self.ultima_map.height_chunks,
                 "total_objects": total_objects,
-                "unique_shapes": len(shape_counts)
+                "unique_shapes": len(shapes)
             },
-            "shape_counts": dict(sorted(shape_counts.items(), key=lambda x: -x[1])[:20])
+            "shape_counts": dict(zip(shapes[top].tolist(), counts[top].tolist()))
         }
 
         # Add generator statistics if provided
@@ -1147,15 +1537,15 @@ class MapExporter:
         if seed:
             summary["seed"] = seed
 
-        with open(output_path, "w") as f:
-            json.dump(summary, f, indent=2)
+        _dump(summary, output_path, pretty)
 
         print(f"Exported summary to {output_path}")
 
-    def export_npc_profiles(self, output_path: str):
+    def export_npc_profiles(self, output_path: str, pretty: bool = False):
         """Export NPC profiles for AI system integration.
 
-        Generates JSON compatible with the Ultima NPC AI system's NPCProfile format.
+        Generates JSON compatible with the Ultima NPC AI system's NPCProfile format,
+        compact unless pretty is set.
         """
         if not self.npc_profiles:
             print("No NPCs to export")
@@ -1168,7 +1558,14 @@ class MapExporter:
             "npcs": []
         }
 
-        for profile in self.npc_profiles:
+        # Round all personality traits in one pass
+        traits = np.round(np.array([
+            (p.openness, p.conscientiousness, p.extraversion, p.agreeableness, p.neuroticism)
+            for p in self.npc_profiles
+        ]), 3).tolist()
+
+        for profile, (openness, conscientiousness, extraversion, agreeableness, neuroticism) in zip(
+                self.npc_profiles, traits):
             npc_data = {
                 "id": profile.id,
                 "name": profile.name,
@@ -1180,18 +1577,18 @@ class MapExporter:
                 },
                 "shape": profile.shape,
                 "personality": {
-                    "openness": round(profile.openness, 3),
-                    "conscientiousness": round(profile.conscientiousness, 3),
-                    "extraversion": round(profile.extraversion, 3),
-                    "agreeableness": round(profile.agreeableness, 3),
-                    "neuroticism": round(profile.neuroticism, 3)
+                    "openness": openness,
+                    "conscientiousness": conscientiousness,
+                    "extraversion": extraversion,
+                    "agreeableness": agreeableness,
+                    "neuroticism": neuroticism
                 },
                 "dialogues": profile.dialogues,
                 "schedule": profile.schedule,
                 "knowledge_domains": profile.knowledge_domains,
                 "relationships": {
                     k: round(v, 3) for k, v in profile.relationships.items()
-                }
+                } if profile.relationships else {}
             }
             profiles_data["npcs"].append(npc_data)
 
@@ -1199,8 +1596,7 @@ class MapExporter:
         total_relationships = sum(len(p.relationships) for p in self.npc_profiles)
         profiles_data["relationship_count"] = total_relationships
 
-        with open(output_path, "w") as f:
-            json.dump(profiles_data, f, indent=2)
+        _dump(profiles_data, output_path, pretty)
 
         print(f"Exported {len(self.npc_profiles)} NPC profiles to {output_path}")
 
@@ -1220,12 +1616,16 @@ def main():
     parser.add_argument("--output", type=str, required=True, help="Output directory name")
     parser.add_argument("--size", type=str, default="16,16", help="Map size in chunks (width,height)")
     parser.add_argument("--format", type=str, default="all",
-                        choices=["all", "geojson", "ireg", "text"],
+                        choices=["all", "geojson", "ireg", "text", "binary"],
                         help="Output format")
     parser.add_argument("--seed", type=str, default=None,
                         help="Random seed for reproducible generation (string or integer)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to rasterize terrain and encode GeoJSON")
 
     args = parser.parse_args()
+    if args.format == "binary" and msgpack is None:
+        parser.error("--format binary needs msgpack (pip install msgpack)")
 
     # Initialize random seed for reproducible generation
     if args.seed is not None:
@@ -1233,12 +1633,14 @@ def main():
         try:
             seed_value = int(args.seed)
         except ValueError:
-            seed_value = int(hashlib.md5(args.seed.encode()).hexdigest(), 16) % (2**32)
+            seed_value = int.from_bytes(hashlib.blake2b(args.seed.encode(), digest_size=4).digest(), "big")
         random.seed(seed_value)
         print(f"Using random seed: {args.seed} (value: {seed_value})")
     
     # Parse map size
     map_size = tuple(map(int, args.size.split(",")))
+    if len(map_size) != 2 or not all(1 <= n <= MAX_MAP_CHUNKS for n in map_size):
+        parser.error(f"--size must be two chunk counts between 1 and {MAX_MAP_CHUNKS}")
     
     # Get bounding box
     fetcher = OSMFetcher()
@@ -1252,19 +1654,20 @@ def main():
     
     print(f"Bounding box: {bbox}")
     
-    # Fetch OSM data
-    osm_data = fetcher.fetch_osm_data(bbox)
-    
-    # Generate map
-    generator = MapGenerator(bbox, map_size)
-    generator.process_osm_data(osm_data)
+    # Generate map, streaming small areas and fetching large ones tile by tile
+    generator = MapGenerator(bbox, map_size, workers=args.workers)
+    if max(bbox[2] - bbox[0], bbox[3] - bbox[1]) > OSMFetcher.OVERPASS_TILE_DEG:
+        elements = fetcher.fetch_osm_tiled(bbox)["elements"]
+    else:
+        elements = fetcher.iter_osm_elements(bbox)
+    generator.process_osm_elements(elements)
     
     # Create output directory
     output_dir = os.path.join(os.getcwd(), args.output)
     os.makedirs(output_dir, exist_ok=True)
     
     # Export
-    exporter = MapExporter(generator.ultima_map, generator.npc_profiles)
+    exporter = MapExporter(generator.ultima_map, generator.npc_profiles, workers=args.workers)
 
     if args.format in ["all", "geojson"]:
         exporter.export_geojson(os.path.join(output_dir, "map.geojson"))
@@ -1275,14 +1678,20 @@ def main():
     if args.format in ["all", "text"]:
         exporter.export_terrain_map(os.path.join(output_dir, "terrain.txt"))
 
-    # Export NPC profiles for AI system
-    exporter.export_npc_profiles(os.path.join(output_dir, "npc_profiles.json"))
+    # MessagePack for other tools in a pipeline; JSON stays alongside for people
+    extensions = [".json", ".msgpack"] if args.format == "binary" else [".json"]
+    if args.format == "binary":
+        exporter.export_binary(os.path.join(output_dir, "map.msgpack"))
+
+    for ext in extensions:
+        # Export NPC profiles for AI system
+        exporter.export_npc_profiles(os.path.join(output_dir, "npc_profiles" + ext))
 
-    exporter.export_summary(
-        os.path.join(output_dir, "summary.json"),
-        generator_stats=generator.stats,
-        seed=args.seed
-    )
+        exporter.export_summary(
+            os.path.join(output_dir, "summary" + ext),
+            generator_stats=generator.stats,
+            seed=args.seed
+        )
 
     # Print generation statistics
     print(f"\n=== Generation Statistics ===")
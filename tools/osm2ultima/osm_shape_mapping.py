@@ -7,11 +7,28 @@ and Ultima VII shape numbers for procedural map generation.
 Shape numbers are from Ultima VII: The Black Gate (shapes.vga)
 """
 
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+from rasterize import HAVE_NUMBA, lonlat_to_tiles
+
+
+def _freeze(shape_lists):
+    """Turn a name -> shape list table into name -> tuple, since the lists are only read."""
+    return {name: tuple(shapes) for name, shapes in shape_lists.items()}
+
+
+def _freeze_mappings(mappings):
+    """Turn a name -> dict table into name -> read-only mapping."""
+    return {name: MappingProxyType(mapping) for name, mapping in mappings.items()}
+
 # =============================================================================
 # TERRAIN / GROUND SHAPES (used for chunk terrain)
 # =============================================================================
 
-TERRAIN_SHAPES = {
+TERRAIN_SHAPES = _freeze({
     # Natural terrain
     "grass": [4, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 146, 147, 148],
     "sand": [10, 111],
@@ -35,7 +52,7 @@ TERRAIN_SHAPES = {
     "floor": [189, 193, 367, 368, 369, 370, 441],
     "ford": [14, 15, 84, 112],  # shallow water crossing
     "rut": [16, 25],  # cart tracks/road
-}
+})
 
 # =============================================================================
 # OSM TAG TO TERRAIN MAPPING
@@ -105,7 +122,7 @@ OSM_SURFACE_TO_TERRAIN = {
 # OBJECT SHAPES (placed on terrain)
 # =============================================================================
 
-OBJECT_SHAPES = {
+OBJECT_SHAPES = _freeze({
     # Trees and vegetation
     "tree": [181, 310, 332, 453],  # various tree shapes
     "evergreen": [306],
@@ -227,7 +244,7 @@ OBJECT_SHAPES = {
     "moongate": [157],
     "platform": [233, 364],
     "stand": [158],
-}
+})
 
 # =============================================================================
 # OSM TAG TO OBJECT MAPPING
@@ -245,7 +262,7 @@ OSM_AMENITY_TO_SHAPE = {
     "place_of_worship": "statue",
 }
 
-OSM_BUILDING_TO_SHAPES = {
+OSM_BUILDING_TO_SHAPES = _freeze_mappings({
     # Residential
     "house": {"walls": "wall", "roof": "roof_slate", "door": "door", "window": "window"},
     "residential": {"walls": "wall", "roof": "roof_slate", "door": "door", "window": "window"},
@@ -282,7 +299,7 @@ OSM_BUILDING_TO_SHAPES = {
     "tower": {"walls": "fortress", "roof": "roof_slate"},
     "ruins": {"walls": "broken_wall", "roof": "broken_roof"},
     "bridge": {"floor": "bridge"},
-}
+})
 
 OSM_NATURAL_TO_SHAPE = {
     "tree": "tree",
@@ -346,11 +363,65 @@ OSM_WATERWAY_TO_TERRAIN = {
     "dam": "stone_floor",
 }
 
+# =============================================================================
+# ARRAY LOOKUP TABLES (small integer ids, for NumPy/numba code paths)
+# =============================================================================
+
+TERRAIN_TYPES = tuple(TERRAIN_SHAPES)
+TERRAIN_TYPE_ID = {name: i for i, name in enumerate(TERRAIN_TYPES)}
+
+
+def _build_shape_table(shape_lists):
+    """Pack ragged shape lists into a zero-padded uint16 table plus row lengths."""
+    counts = np.array([len(shapes) for shapes in shape_lists], dtype=np.intp)
+    table = np.zeros((len(shape_lists), counts.max()), dtype=np.uint16)
+    for row, shapes in enumerate(shape_lists):
+        table[row, :len(shapes)] = shapes
+    return table, counts
+
+
+# Row i holds the shapes of TERRAIN_TYPES[i]; only the first
+# TERRAIN_SHAPE_COUNTS[i] entries are valid
+TERRAIN_SHAPE_TABLE, TERRAIN_SHAPE_COUNTS = _build_shape_table(
+    [TERRAIN_SHAPES[name] for name in TERRAIN_TYPES])
+
+HIGHWAY_TAGS = tuple(sorted(OSM_HIGHWAY_TO_TERRAIN))
+HIGHWAY_TAG_ID = {tag: i for i, tag in enumerate(HIGHWAY_TAGS)}
+
+# highway tag id -> terrain type id
+HIGHWAY_TERRAIN_LUT = np.array(
+    [TERRAIN_TYPE_ID[OSM_HIGHWAY_TO_TERRAIN[tag]] for tag in HIGHWAY_TAGS], dtype=np.uint16)
+
+
+def terrain_shape_array(type_id):
+    """
+    Get the shape numbers for a terrain type id.
+    Returns a uint16 array view into TERRAIN_SHAPE_TABLE.
+    """
+    return TERRAIN_SHAPE_TABLE[type_id, :TERRAIN_SHAPE_COUNTS[type_id]]
+
+
+# Name -> uint16 shape array, for callers that draw shapes in bulk
+TERRAIN_SHAPE_ARRAYS = {name: terrain_shape_array(i) for i, name in enumerate(TERRAIN_TYPES)}
+OBJECT_SHAPE_ARRAYS = {name: np.asarray(shapes, dtype=np.uint16) for name, shapes in OBJECT_SHAPES.items()}
+
+
+def sample_terrain(terrain_type, n, rng):
+    """
+    Draw n random shapes of a terrain type with a NumPy Generator.
+    Returns a uint16 array, ready to scatter into the terrain grid.
+    """
+    return rng.choice(TERRAIN_SHAPE_ARRAYS[terrain_type], size=n)
+
+# Inverted index: shape number -> terrain type
+SHAPE_TO_TERRAIN = {shape: name for name, shapes in TERRAIN_SHAPES.items() for shape in shapes}
+
+
 # =============================================================================
 # NPC SHAPES (for populated areas)
 # =============================================================================
 
-NPC_SHAPES = {
+NPC_SHAPES = _freeze({
     "townsman": [265, 319, 452],
     "townswoman": [459],  # wench
     "noble_male": [451, 456],
@@ -370,107 +441,111 @@ NPC_SHAPES = {
     "entertainer": [468, 469],
     "jester": [467],
     "sage": [318, 448],
-}
+})
+
+# Stable NPC type code stored in the object quality byte (0 = unknown)
+NPC_TYPE_QUALITY = {npc_type: i for i, npc_type in enumerate(NPC_SHAPES, start=1)}
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+# Tag keys checked for terrain, in priority order, with the terrain used
+# when the mapped type has no shapes
+_TERRAIN_TAG_PRIORITY = (
+    ("landuse", OSM_LANDUSE_TO_TERRAIN, "grass"),
+    ("natural", OSM_NATURAL_TO_TERRAIN, "grass"),
+    ("surface", OSM_SURFACE_TO_TERRAIN, "grass"),
+    ("highway", OSM_HIGHWAY_TO_TERRAIN, "cobblestone"),
+    ("waterway", OSM_WATERWAY_TO_TERRAIN, "water"),
+)
+_TERRAIN_TAG_KEYS = tuple(key for key, _, _ in _TERRAIN_TAG_PRIORITY)
+
+
+@lru_cache(maxsize=1024)
+def _terrain_type_for_values(values):
+    """Resolve the values of _TERRAIN_TAG_KEYS (None if absent) to a TERRAIN_SHAPES key."""
+    for value, (_, mapping, fallback) in zip(values, _TERRAIN_TAG_PRIORITY):
+        if value and value in mapping:
+            terrain_type = mapping[value]
+            return terrain_type if terrain_type in TERRAIN_SHAPES else fallback
+    
+    # Default to grass
+    return "grass"
+
+
+def _terrain_type_for(osm_tags):
+    """Resolve OSM tags to a TERRAIN_SHAPES key."""
+    # Only the relevant tags take part, so recurring tag patterns hit the cache
+    return _terrain_type_for_values(tuple(map(osm_tags.get, _TERRAIN_TAG_KEYS)))
+
+
 def get_terrain_shape(osm_tags):
     """
     Get appropriate terrain shape number from OSM tags.
-    Returns a list of possible shape numbers.
+    Returns a tuple of possible shape numbers.
     """
-    # Check landuse first
-    landuse = osm_tags.get("landuse")
-    if landuse and landuse in OSM_LANDUSE_TO_TERRAIN:
-        terrain_type = OSM_LANDUSE_TO_TERRAIN[landuse]
-        return TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["grass"])
-    
-    # Check natural
-    natural = osm_tags.get("natural")
-    if natural and natural in OSM_NATURAL_TO_TERRAIN:
-        terrain_type = OSM_NATURAL_TO_TERRAIN[natural]
-        return TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["grass"])
-    
-    # Check surface
-    surface = osm_tags.get("surface")
-    if surface and surface in OSM_SURFACE_TO_TERRAIN:
-        terrain_type = OSM_SURFACE_TO_TERRAIN[surface]
-        return TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["grass"])
-    
-    # Check highway
-    highway = osm_tags.get("highway")
-    if highway and highway in OSM_HIGHWAY_TO_TERRAIN:
-        terrain_type = OSM_HIGHWAY_TO_TERRAIN[highway]
-        return TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["cobblestone"])
-    
-    # Check waterway
-    waterway = osm_tags.get("waterway")
-    if waterway and waterway in OSM_WATERWAY_TO_TERRAIN:
-        terrain_type = OSM_WATERWAY_TO_TERRAIN[waterway]
-        return TERRAIN_SHAPES.get(terrain_type, TERRAIN_SHAPES["water"])
+    return TERRAIN_SHAPES[_terrain_type_for(osm_tags)]
+
+
+def get_terrain_shape_array(osm_tags):
+    """Like get_terrain_shape, but returns the uint16 shape array."""
+    return TERRAIN_SHAPE_ARRAYS[_terrain_type_for(osm_tags)]
+
+
+# Tag keys checked for point objects after "building", in priority order
+_OBJECT_TAG_PRIORITY = (
+    ("amenity", OSM_AMENITY_TO_SHAPE),
+    ("natural", OSM_NATURAL_TO_SHAPE),
+    ("barrier", OSM_BARRIER_TO_SHAPE),
+    ("man_made", OSM_MAN_MADE_TO_SHAPE),
+)
+_OBJECT_TAG_KEYS = ("building",) + tuple(key for key, _ in _OBJECT_TAG_PRIORITY)
+
+
+@lru_cache(maxsize=1024)
+def _object_shape_names_for_values(values):
+    """Resolve the values of _OBJECT_TAG_KEYS to (component, OBJECT_SHAPES key) pairs."""
+    # Check building
+    building = values[0]
+    if building:
+        building_type = building if building in OSM_BUILDING_TO_SHAPES else "house"
+        building_def = OSM_BUILDING_TO_SHAPES.get(building_type, OSM_BUILDING_TO_SHAPES["house"])
+        return tuple((component, shape_name) for component, shape_name in building_def.items()
+                     if shape_name in OBJECT_SHAPES)
     
-    # Default to grass
-    return TERRAIN_SHAPES["grass"]
+    # Check amenity, natural features, barrier and man_made in turn
+    for value, (_, mapping) in zip(values[1:], _OBJECT_TAG_PRIORITY):
+        if value and value in mapping:
+            shape_name = mapping[value]
+            return (("main", shape_name),) if shape_name in OBJECT_SHAPES else ()
+    
+    return ()
+
+
+def _object_shape_names(osm_tags):
+    """Resolve OSM tags to (component, OBJECT_SHAPES key) pairs."""
+    return _object_shape_names_for_values(tuple(map(osm_tags.get, _OBJECT_TAG_KEYS)))
 
 
 def get_object_shapes(osm_tags):
     """
     Get appropriate object shape numbers from OSM tags.
-    Returns a dictionary of component -> shape list.
+    Returns a dictionary of component -> shape tuple.
     """
-    result = {}
-    
-    # Check building
-    building = osm_tags.get("building")
-    if building:
-        building_type = building if building in OSM_BUILDING_TO_SHAPES else "house"
-        building_def = OSM_BUILDING_TO_SHAPES.get(building_type, OSM_BUILDING_TO_SHAPES["house"])
-        for component, shape_name in building_def.items():
-            if shape_name in OBJECT_SHAPES:
-                result[component] = OBJECT_SHAPES[shape_name]
-        return result
-    
-    # Check amenity
-    amenity = osm_tags.get("amenity")
-    if amenity and amenity in OSM_AMENITY_TO_SHAPE:
-        shape_name = OSM_AMENITY_TO_SHAPE[amenity]
-        if shape_name in OBJECT_SHAPES:
-            result["main"] = OBJECT_SHAPES[shape_name]
-        return result
-    
-    # Check natural features
-    natural = osm_tags.get("natural")
-    if natural and natural in OSM_NATURAL_TO_SHAPE:
-        shape_name = OSM_NATURAL_TO_SHAPE[natural]
-        if shape_name in OBJECT_SHAPES:
-            result["main"] = OBJECT_SHAPES[shape_name]
-        return result
-    
-    # Check barrier
-    barrier = osm_tags.get("barrier")
-    if barrier and barrier in OSM_BARRIER_TO_SHAPE:
-        shape_name = OSM_BARRIER_TO_SHAPE[barrier]
-        if shape_name in OBJECT_SHAPES:
-            result["main"] = OBJECT_SHAPES[shape_name]
-        return result
-    
-    # Check man_made
-    man_made = osm_tags.get("man_made")
-    if man_made and man_made in OSM_MAN_MADE_TO_SHAPE:
-        shape_name = OSM_MAN_MADE_TO_SHAPE[man_made]
-        if shape_name in OBJECT_SHAPES:
-            result["main"] = OBJECT_SHAPES[shape_name]
-        return result
-    
-    return result
+    return {component: OBJECT_SHAPES[name] for component, name in _object_shape_names(osm_tags)}
+
+
+def get_object_shape_arrays(osm_tags):
+    """Like get_object_shapes, but with uint16 shape arrays."""
+    return {component: OBJECT_SHAPE_ARRAYS[name] for component, name in _object_shape_names(osm_tags)}
 
 
+@lru_cache(maxsize=128)
 def get_npc_for_building(building_type):
     """
     Get appropriate NPC types for a building type.
-    Returns a list of NPC shape numbers.
+    Returns a tuple of NPC shape numbers (cached, so it is shared between calls).
     """
     npc_mapping = {
         "house": ["townsman", "townswoman", "child"],
@@ -494,7 +569,7 @@ def get_npc_for_building(building_type):
     for npc_type in npc_types:
         if npc_type in NPC_SHAPES:
             shapes.extend(NPC_SHAPES[npc_type])
-    return shapes
+    return tuple(shapes)
 
 
 # =============================================================================
@@ -741,9 +816,9 @@ def get_furniture_for_room(building_type: str, room_type: str):
 def get_furniture_shapes(furniture_name: str):
     """
     Get shape numbers for a furniture item.
-    Returns a list of shape numbers.
+    Returns a tuple of shape numbers.
     """
-    return OBJECT_SHAPES.get(furniture_name, [])
+    return OBJECT_SHAPES.get(furniture_name, ())
 
 
 def get_npc_with_dialogue(npc_type: str):
@@ -763,6 +838,10 @@ class CoordinateTransformer:
     Transform OSM lat/lon coordinates to Ultima tile coordinates.
     """
     
+    # Arrays at least this big are converted by the numba kernel, when numba
+    # is installed; below it thread start-up costs more than it saves
+    NUMBA_MIN_POINTS = 4096
+    
     def __init__(self, bbox, ultima_size=(192, 192)):
         """
         Initialize transformer with OSM bounding box and target Ultima map size.
@@ -777,40 +856,113 @@ class CoordinateTransformer:
         # Ultima map dimensions in tiles
         self.tiles_x = ultima_size[0] * 16  # chunks * tiles_per_chunk
         self.tiles_y = ultima_size[1] * 16
+        
+        # Tiles per degree, so a point costs one subtract and one multiply
+        # per axis. Y is flipped (OSM has origin at bottom-left, Ultima at
+        # top-left), so it counts down from tiles_y. A zero-width range maps
+        # every point to the middle of the map through the offset alone.
+        self._scale_x = self.tiles_x / self.lon_range if self.lon_range > 0 else 0.0
+        self._scale_y = self.tiles_y / self.lat_range if self.lat_range > 0 else 0.0
+        self._offset_x = 0.0 if self.lon_range > 0 else self.tiles_x * 0.5
+        self._offset_y = float(self.tiles_y) if self.lat_range > 0 else self.tiles_y * 0.5
+        
+        # Largest valid tile coordinates, for clamping
+        self._max_x = self.tiles_x - 1
+        self._max_y = self.tiles_y - 1
+        
+        # Everything osm_to_ultima needs, unpacked into locals in one step
+        self._params = (self.min_lon, self._scale_x, self._offset_x, self._max_x,
+                        self.min_lat, self._scale_y, self._offset_y, self._max_y)
+    
+    @classmethod
+    def get(cls, bbox, ultima_size=(192, 192)):
+        """
+        Get a shared transformer for bbox and ultima_size, built once per distinct pair.
+        Callers that change a transformer's attributes should construct their own.
+        """
+        return _make_transformer(tuple(map(float, bbox)), tuple(map(int, ultima_size)))
     
     def osm_to_ultima(self, lon, lat):
         """
         Convert OSM coordinates to Ultima tile coordinates.
         Returns (tile_x, tile_y)
         """
-        # Normalize to 0-1 range
-        norm_x = (lon - self.min_lon) / self.lon_range if self.lon_range > 0 else 0.5
-        norm_y = (lat - self.min_lat) / self.lat_range if self.lat_range > 0 else 0.5
-        
-        # Flip Y axis (OSM has origin at bottom-left, Ultima at top-left)
-        norm_y = 1.0 - norm_y
+        min_lon, scale_x, offset_x, max_x, min_lat, scale_y, offset_y, max_y = self._params
         
         # Scale to Ultima coordinates
-        tile_x = int(norm_x * self.tiles_x)
-        tile_y = int(norm_y * self.tiles_y)
+        tile_x = int(offset_x + (lon - min_lon) * scale_x)
+        tile_y = int(offset_y - (lat - min_lat) * scale_y)
         
         # Clamp to valid range
-        tile_x = max(0, min(self.tiles_x - 1, tile_x))
-        tile_y = max(0, min(self.tiles_y - 1, tile_y))
+        if tile_x < 0:
+            tile_x = 0
+        elif tile_x > max_x:
+            tile_x = max_x
+        if tile_y < 0:
+            tile_y = 0
+        elif tile_y > max_y:
+            tile_y = max_y
+        
+        return (tile_x, tile_y)
+    
+    def transform_many(self, lons, lats):
+        """
+        Vectorized osm_to_ultima for arrays of coordinates of any shape.
+        Returns (tile_xs, tile_ys) as int32 arrays of the same shape.
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        
+        # Large arrays go through the parallel numba kernel
+        if HAVE_NUMBA and lons.size >= self.NUMBA_MIN_POINTS:
+            lons, lats = np.broadcast_arrays(lons, lats)
+            tile_x = np.empty(lons.shape, dtype=np.int32)
+            tile_y = np.empty(lons.shape, dtype=np.int32)
+            lonlat_to_tiles(lons.ravel(), lats.ravel(), self.min_lon, self.min_lat,
+                            self._scale_x, self._scale_y, self._offset_x, self._offset_y,
+                            self._max_x, self._max_y,
+                            tile_x.reshape(-1), tile_y.reshape(-1))
+            return (tile_x, tile_y)
+        
+        # Same arithmetic as osm_to_ultima so both paths agree tile-for-tile,
+        # done in place in one scratch buffer per axis. Clamping before the
+        # truncating cast gives the same tiles and keeps far-off points from
+        # overflowing int32.
+        tx = np.subtract(lons, self.min_lon)
+        np.multiply(tx, self._scale_x, out=tx)
+        np.add(tx, self._offset_x, out=tx)
+        np.clip(tx, 0, self._max_x, out=tx)
+        ty = np.subtract(lats, self.min_lat)
+        np.multiply(ty, self._scale_y, out=ty)
+        np.subtract(self._offset_y, ty, out=ty)
+        np.clip(ty, 0, self._max_y, out=ty)
+        tile_x = tx.astype(np.int32)
+        tile_y = ty.astype(np.int32)
         
         return (tile_x, tile_y)
     
+    def osm_to_ultima_batch(self, coords):
+        """
+        Convert a sequence of (lon, lat) pairs in one vectorized pass.
+        Returns an (N, 2) int32 array of (tile_x, tile_y) rows.
+        """
+        lonlat = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(self.transform_many(lonlat[:, 0], lonlat[:, 1]))
+    
     def osm_to_chunk(self, lon, lat):
         """
         Convert OSM coordinates to Ultima chunk coordinates.
         Returns (chunk_x, chunk_y, tile_x_in_chunk, tile_y_in_chunk)
         """
         tile_x, tile_y = self.osm_to_ultima(lon, lat)
-        chunk_x = tile_x // 16
-        chunk_y = tile_y // 16
-        local_x = tile_x % 16
-        local_y = tile_y % 16
-        return (chunk_x, chunk_y, local_x, local_y)
+        # Tiles are clamped non-negative, so shift/mask equal // 16 and % 16
+        return (tile_x >> 4, tile_y >> 4, tile_x & 0xF, tile_y & 0xF)
+
+
+@lru_cache(maxsize=128)
+def _make_transformer(bbox, ultima_size):
+    """Cached CoordinateTransformer factory behind CoordinateTransformer.get."""
+    return CoordinateTransformer(bbox, ultima_size)
 
 
 if __name__ == "__main__":
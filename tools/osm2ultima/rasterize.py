@@ -0,0 +1,414 @@
+"""
+Rasterization kernels for osm2ultima
+
+Burns tile-space lines and polygons straight into the UltimaMap terrain
+array, converts lon/lat points to tiles in bulk and packs object records
+into IREG bytes. The kernels are compiled with numba when it is installed
+and run as plain Python otherwise.
+
+MapGenerator queues its terrain writes as burn ops; burn_bands replays the
+queue band by band, optionally across worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def seed(value):
+    """Seed the random generator used by the kernels."""
+    np.random.seed(value)
+
+
+def bresenham_points(x0, y0, x1, y1):
+    """Yield the integer Bresenham points from (x0, y0) to (x1, y1), both ends included."""
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+
+    while True:
+        yield x0, y0
+        if x0 == x1 and y0 == y1:
+            return
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+@njit(cache=True)
+def burn_thick_line(arr, x0, y0, x1, y1, width, shapes):
+    """
+    Burn an integer Bresenham line from (x0, y0) to (x1, y1) into arr.
+
+    Every point is widened to the box of offsets -(width + 1) // 2 ..
+    width // 2 around it, so width 0 is a one-tile line. Each tile gets a
+    random entry of shapes; tiles outside arr are skipped.
+    """
+    height, arr_width = arr.shape
+    count = shapes.shape[0]
+    lo = -((width + 1) // 2)
+    hi = width // 2
+
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+
+    while True:
+        for ty in range(max(y0 + lo, 0), min(y0 + hi + 1, height)):
+            for tx in range(max(x0 + lo, 0), min(x0 + hi + 1, arr_width)):
+                arr[ty, tx] = shapes[np.random.randint(0, count)]
+        if x0 == x1 and y0 == y1:
+            break
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+@njit(cache=True)
+def burn_polygon(arr, xs, ys, shapes):
+    """
+    Scanline-fill the polygon with vertices (xs, ys) into arr.
+
+    Edges are kept in an active edge table so each row only visits the
+    edges spanning it. A tile (x, y) is filled when it passes the even-odd
+    ray test, i.e. x lies in [x_2k, x_2k+1) of the sorted row crossings.
+    """
+    height, width = arr.shape
+    count = shapes.shape[0]
+    n = xs.shape[0]
+
+    # Edge table (horizontal edges never cross a scanline)
+    edge_ylo = np.empty(n, np.int64)
+    edge_yhi = np.empty(n, np.int64)
+    edge_x = np.empty(n, np.float64)
+    edge_slope = np.empty(n, np.float64)
+    m = 0
+    for i in range(n):
+        j = i - 1 if i > 0 else n - 1
+        if ys[i] == ys[j]:
+            continue
+        lo, hi = (i, j) if ys[i] < ys[j] else (j, i)
+        edge_ylo[m] = ys[lo]
+        edge_yhi[m] = ys[hi]
+        edge_x[m] = xs[lo]
+        edge_slope[m] = (xs[hi] - xs[lo]) / (ys[hi] - ys[lo])
+        m += 1
+
+    if m == 0:
+        return
+
+    order = np.argsort(edge_ylo[:m])
+    active = np.empty(m, np.int64)
+    crossings = np.empty(m, np.float64)
+    n_active = 0
+    next_edge = 0
+    y = edge_ylo[order[0]]
+    y_end = min(edge_yhi[:m].max(), height)
+
+    while y < y_end:
+        # Activate edges starting on this row
+        while next_edge < m and edge_ylo[order[next_edge]] <= y:
+            active[n_active] = order[next_edge]
+            n_active += 1
+            next_edge += 1
+
+        # Retire finished edges and collect row crossings
+        kept = 0
+        for a in range(n_active):
+            e = active[a]
+            if edge_yhi[e] > y:
+                active[kept] = e
+                crossings[kept] = edge_x[e] + (y - edge_ylo[e]) * edge_slope[e]
+                kept += 1
+        n_active = kept
+
+        if y >= 0:
+            row = np.sort(crossings[:n_active])
+            for p in range(0, n_active - 1, 2):
+                start = max(int(np.ceil(row[p])), 0)
+                end = min(int(np.ceil(row[p + 1])), width)
+                for x in range(start, end):
+                    arr[y, x] = shapes[np.random.randint(0, count)]
+        y += 1
+
+
+@njit(cache=True)
+def mark_thick_line(arr, x0, y0, x1, y1, width, value, overlap_value):
+    """
+    Mark the tiles burn_thick_line would draw with value, or with
+    overlap_value where a tile is already nonzero.
+    """
+    height, arr_width = arr.shape
+    lo = -((width + 1) // 2)
+    hi = width // 2
+
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+
+    while True:
+        for ty in range(max(y0 + lo, 0), min(y0 + hi + 1, height)):
+            for tx in range(max(x0 + lo, 0), min(x0 + hi + 1, arr_width)):
+                arr[ty, tx] = overlap_value if arr[ty, tx] else value
+        if x0 == x1 and y0 == y1:
+            break
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def _burn_polygon_numpy(arr, xs, ys, shapes):
+    """
+    NumPy version of burn_polygon for when numba is not installed.
+
+    Instead of scanning every edge on every row, each edge is expanded
+    once into its row crossings; sorting those by (row, x) gives every
+    row's crossing list, the vectorized equivalent of an active edge
+    table. The filled tiles match burn_polygon.
+    """
+    height, width = arr.shape
+    xi = np.asarray(xs, dtype=np.int64)
+    yi = np.asarray(ys, dtype=np.int64)
+    xj = np.roll(xi, 1)
+    yj = np.roll(yi, 1)
+
+    # Edge table (horizontal edges never cross a scanline)
+    keep = yi != yj
+    lo_first = yi < yj
+    edge_ylo = np.where(lo_first, yi, yj)[keep]
+    edge_yhi = np.where(lo_first, yj, yi)[keep]
+    edge_x = np.where(lo_first, xi, xj)[keep].astype(np.float64)
+    edge_slope = (np.where(lo_first, xj, xi)[keep] - edge_x) / (edge_yhi - edge_ylo)
+
+    # One crossing per (edge, row) with the row clipped to arr
+    first = np.maximum(edge_ylo, 0)
+    rows_per_edge = np.maximum(np.minimum(edge_yhi, height) - first, 0)
+    total = int(rows_per_edge.sum())
+    if total == 0:
+        return
+    edge = np.repeat(np.arange(len(first)), rows_per_edge)
+    row = first[edge] + np.arange(total) - np.repeat(np.cumsum(rows_per_edge) - rows_per_edge, rows_per_edge)
+    cross = edge_x[edge] + (row - edge_ylo[edge]) * edge_slope[edge]
+
+    order = np.lexsort((cross, row))
+    row = row[order]
+    cross = np.clip(np.ceil(cross[order]), 0, width).astype(np.int64)
+
+    # Pair crossings 2k, 2k+1 within each row
+    row_start = np.flatnonzero(np.r_[True, row[1:] != row[:-1]])
+    row_len = np.diff(np.r_[row_start, total])
+    rank = np.arange(total) - np.repeat(row_start, row_len)
+    opens = np.flatnonzero((rank % 2 == 0) & (rank + 1 < np.repeat(row_len, row_len)))
+    run_row = row[opens]
+    run_start = cross[opens]
+    run_len = np.maximum(cross[opens + 1] - run_start, 0)
+
+    # Fill all runs at once
+    tiles = int(run_len.sum())
+    if tiles == 0:
+        return
+    fill_row = np.repeat(run_row, run_len)
+    fill_col = np.repeat(run_start, run_len) + np.arange(tiles) - np.repeat(np.cumsum(run_len) - run_len, run_len)
+    arr[fill_row, fill_col] = shapes[np.random.randint(0, shapes.shape[0], tiles)]
+
+
+def _burn_thick_line_numpy(arr, x0, y0, x1, y1, width, shapes):
+    """
+    NumPy version of burn_thick_line for when numba is not installed.
+
+    The Bresenham points are widened to their boxes all at once and the
+    tiles inside arr get one vectorized shape draw.
+    """
+    height, arr_width = arr.shape
+    points = np.array(list(bresenham_points(x0, y0, x1, y1)), dtype=np.int64)
+    offsets = np.arange(-((width + 1) // 2), width // 2 + 1)
+    box_x, box_y = np.meshgrid(offsets, offsets)
+    tx = (points[:, 0, None] + box_x.ravel()).ravel()
+    ty = (points[:, 1, None] + box_y.ravel()).ravel()
+    inside = (tx >= 0) & (tx < arr_width) & (ty >= 0) & (ty < height)
+    tx = tx[inside]
+    ty = ty[inside]
+    arr[ty, tx] = shapes[np.random.randint(0, shapes.shape[0], len(tx))]
+
+
+if not HAVE_NUMBA:
+    burn_thick_line = _burn_thick_line_numpy
+    burn_polygon = _burn_polygon_numpy
+
+
+@njit(cache=True)
+def burn_rect(arr, x0, y0, x1, y1, shapes):
+    """Fill the inclusive rectangle [x0, x1] x [y0, y1] of arr, clipped to its bounds."""
+    height, width = arr.shape
+    count = shapes.shape[0]
+
+    for y in range(max(y0, 0), min(y1 + 1, height)):
+        for x in range(max(x0, 0), min(x1 + 1, width)):
+            arr[y, x] = shapes[np.random.randint(0, count)]
+
+
+def _burn_rect_numpy(arr, x0, y0, x1, y1, shapes):
+    """NumPy version of burn_rect: one slice assignment and one shape draw."""
+    height, width = arr.shape
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1 + 1, width), min(y1 + 1, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    arr[y0:y1, x0:x1] = shapes[np.random.randint(0, shapes.shape[0], (y1 - y0, x1 - x0))]
+
+
+if not HAVE_NUMBA:
+    burn_rect = _burn_rect_numpy
+
+
+@njit(parallel=True, cache=True)
+def lonlat_to_tiles(lons, lats, min_lon, min_lat, scale_x, scale_y, offset_x, offset_y,
+                    max_x, max_y, tile_x, tile_y):
+    """
+    Convert flat lon/lat arrays to tile coordinates clamped to [0, max_x] x
+    [0, max_y], written into tile_x and tile_y. Same arithmetic as
+    CoordinateTransformer.osm_to_ultima.
+    """
+    for i in prange(lons.shape[0]):
+        x = int(offset_x + (lons[i] - min_lon) * scale_x)
+        y = int(offset_y - (lats[i] - min_lat) * scale_y)
+        tile_x[i] = min(max(x, 0), max_x)
+        tile_y[i] = min(max(y, 0), max_y)
+
+
+@njit(parallel=True, cache=True)
+def pack_ireg(shape, frame, x, y, lift, quality, out):
+    """
+    Write 10-byte IREG records for parallel object columns into the rows of
+    the (N, 10) uint8 array out, in a single pass over the objects.
+    """
+    for i in prange(shape.shape[0]):
+        s = shape[i]
+        out[i, 0] = 10  # length
+        out[i, 1] = x[i] & 0xff  # (chunk % 16) << 4 | local tile
+        out[i, 2] = y[i] & 0xff
+        out[i, 3] = s & 0xff
+        out[i, 4] = (((s >> 8) & 3) | (frame[i] << 2)) & 0xff
+        out[i, 5] = lift[i] & 0x0f
+        out[i, 6] = quality[i]
+        out[i, 7] = 0  # temporary flag
+        out[i, 8] = 0  # filler
+        out[i, 9] = 0
+
+
+# ============================================================================
+# BURN QUEUE
+# ============================================================================
+
+# A burn op is (kind, xs, ys, shapes, width) in map tile coordinates. LINE
+# and RECT ops carry their two corner points as (x0, x1) / (y0, y1) tuples,
+# POLYGON ops carry the vertex arrays. width only applies to LINE ops (see
+# burn_thick_line) and is 0 for the others.
+LINE = 0
+POLYGON = 1
+RECT = 2
+
+# Rows per band; fixed so the output does not depend on the worker count
+BAND_ROWS = 64
+
+
+def burn_ops(arr, ops, row_offset=0):
+    """Apply burn ops in order to arr, whose first row is map row row_offset."""
+    for kind, xs, ys, shapes, width in ops:
+        if kind == POLYGON:
+            burn_polygon(arr, xs, ys - row_offset, shapes)
+        elif kind == LINE:
+            burn_thick_line(arr, xs[0], ys[0] - row_offset, xs[1], ys[1] - row_offset, width, shapes)
+        else:
+            burn_rect(arr, xs[0], ys[0] - row_offset, xs[1], ys[1] - row_offset, shapes)
+
+
+def _burn_band(arr, ops, row_offset, band_seed):
+    seed(band_seed)
+    burn_ops(arr, ops, row_offset)
+
+
+def _burn_shared_band(job):
+    """Worker entry point: burn one band of a terrain array in shared memory."""
+    name, shape, dtype, start, stop, ops, band_seed = job
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        terrain = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _burn_band(terrain[start:stop], ops, start, band_seed)
+        del terrain
+    finally:
+        shm.close()
+
+
+def burn_bands(terrain, ops, base_seed, workers=1, band_rows=BAND_ROWS):
+    """
+    Apply burn ops to terrain in horizontal bands of band_rows rows.
+
+    Every band replays, in order, only the ops overlapping its rows and seeds
+    the kernel RNG from base_seed and its band index. With workers > 1 the
+    bands are burned by a process pool over a shared-memory copy of terrain.
+    """
+    if not ops:
+        return
+
+    row_lo = np.array([np.min(op[2]) - (op[4] + 1) // 2 for op in ops])
+    row_hi = np.array([np.max(op[2]) + op[4] // 2 for op in ops])
+
+    jobs = []
+    for index, start in enumerate(range(0, terrain.shape[0], band_rows)):
+        stop = min(start + band_rows, terrain.shape[0])
+        hits = np.flatnonzero((row_lo < stop) & (row_hi >= start))
+        if len(hits):
+            band_seed = (base_seed + index) & 0xFFFFFFFF
+            jobs.append((start, stop, [ops[i] for i in hits], band_seed))
+
+    if workers <= 1 or len(jobs) <= 1:
+        for start, stop, band_ops, band_seed in jobs:
+            _burn_band(terrain[start:stop], band_ops, start, band_seed)
+        return
+
+    shm = shared_memory.SharedMemory(create=True, size=terrain.nbytes)
+    try:
+        shared = np.ndarray(terrain.shape, dtype=terrain.dtype, buffer=shm.buf)
+        shared[:] = terrain
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_burn_shared_band, [
+                (shm.name, terrain.shape, terrain.dtype.str) + job for job in jobs
+            ]))
+        terrain[:] = shared
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()